@@ -5,6 +5,11 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+Run it with uvicorn workers, ex:
+    gunicorn TodoApp.asgi:application -k uvicorn.workers.UvicornWorker -w 4
+or, for a single process:
+    uvicorn TodoApp.asgi:application --port 8000
 """
 
 import os
@@ -12,5 +17,12 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'TodoApp.settings')
+# Route the dashboard, task CRUD and progress polling to their async views
+os.environ.setdefault('ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
+
+# Fail now rather than with a 500 on every page when the static build is missing
+# (imported here: needs the settings loaded above)
+from core.assets import check_manifest
+check_manifest()
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -25,6 +26,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'rest_framework',
     'core.apps.CoreConfig',
     'auths.apps.AuthsConfig',
     'task.apps.TaskConfig',
@@ -32,11 +34,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.StaticFilesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.db_router.ReplicaPinningMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -45,7 +50,9 @@ ROOT_URLCONF = 'TodoApp.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates that reports render time to core.middleware.RequestTimingMiddleware
+        'BACKEND': 'core.middleware.TimedDjangoTemplates',
+        'NAME': 'django',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -59,6 +66,11 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'TodoApp.wsgi.application'
+ASGI_APPLICATION = 'TodoApp.asgi.application'
+
+# Serve the async versions of the dashboard, task CRUD and progress views.
+# Turned on by TodoApp/asgi.py; under WSGI every async view would need its own event loop.
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS') == '1'
 
 
 # Database
@@ -79,6 +91,90 @@ DATABASES = {
     # },
 }
 
+# Read replica used by the read-only paths (core.db_router.replica_reads).
+# Locally: `python manage.py refresh_replica` copies db.sqlite3 to the file named here,
+# ex: DATABASE_REPLICA=db.replica.sqlite3. With PostgreSQL set it to the standby host.
+DATABASE_REPLICA = os.environ.get('DATABASE_REPLICA')
+
+if DATABASE_REPLICA:
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        **({'NAME': BASE_DIR / DATABASE_REPLICA} if DATABASES['default']['ENGINE'].endswith('sqlite3') else {'HOST': DATABASE_REPLICA}),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+# Seconds a user keeps reading from the primary after a write or a dashboard invalidation
+REPLICA_PIN_SECONDS = 5
+REPLICA_PIN_CACHE = 'default'
+
+# Per request SQL/template/view timings (core.middleware.RequestTimingMiddleware):
+# Server-Timing header and Prometheus histograms at /metrics
+REQUEST_METRICS_ENABLED = os.environ.get('REQUEST_METRICS_ENABLED') == '1'
+METRICS_ALLOWED_IPS = ['127.0.0.1']
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# LocMem is per process: with several workers set REDIS_URL so every worker
+# sees the same dashboard versions (ex: redis://localhost:6379/0).
+
+REDIS_URL = os.environ.get('REDIS_URL')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'todo-app',
+        }
+    }
+
+# Server-Sent Events (core.events, /task/events/, ASGI only). The in-process broker
+# only reaches the streams of its own worker: with several workers use 'redis' (REDIS_URL).
+EVENTS_BROKER = os.environ.get('EVENTS_BROKER', 'redis' if REDIS_URL else 'memory')
+EVENTS_KEEPALIVE = 15 # seconds between keepalive comments, keeps proxies from closing the stream
+EVENTS_RETRY_MS = 5000 # reconnection delay sent to the browser
+EVENTS_QUEUE_SIZE = 100 # events buffered per open tab before it is told to refresh
+EVENTS_BATCH_LIMIT = 50 # bulk changes above this send one "refresh" instead of one event per task
+
+# Rendered dashboard fragments (task list, categories), invalidated by task.signals
+DASHBOARD_CACHE = 'default'
+DASHBOARD_CACHE_TIMEOUT = 60 * 5
+
+# Read-through cache of repository lookups (core.cache.RepositoryCache), opt-in.
+# The in-process tier is kept short so other processes see writes quickly.
+REPOSITORY_CACHE_ENABLED = os.environ.get('REPOSITORY_CACHE_ENABLED') == '1'
+REPOSITORY_CACHE = 'default'
+REPOSITORY_CACHE_TIMEOUT = 60 * 5
+REPOSITORY_CACHE_LOCAL_TTL = 5
+REPOSITORY_CACHE_VERSION = 1 # bump when the cached models change shape
+
+
+# Django REST framework (api app)
+
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'rest_framework.authentication.SessionAuthentication',
+        'rest_framework.authentication.BasicAuthentication',
+    ],
+    'DEFAULT_PERMISSION_CLASSES': [
+        'rest_framework.permissions.IsAuthenticated',
+    ],
+}
+
+
+# Delta sync (/api/sync/): clients whose cursor is older than this must resync from scratch
+SYNC_TOMBSTONE_DAYS = 30
+# Seconds a row may wait between its date_update stamp and its commit without being missed by /api/sync/
+SYNC_SAFETY_LAG = 30
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -118,7 +214,26 @@ STATIC_URL = 'static/'
 STATICFILES_DIRS = [
     BASE_DIR / "static",
 ]
-# STATIC_ROOT = os.path.join(BASE_DIR, 'static')
+# Built by `manage.py build_static`: hashed names, staticfiles.json manifest and .gz/.br
+# copies, served by WhiteNoise (hashed files with a 10 year, immutable Cache-Control)
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+# Templates link the hashed names once DEBUG is off (needs the build above: deploy with
+# `manage.py build_static` before starting the server, TodoApp.wsgi/asgi refuse to start without it)
+STATIC_MANIFEST = os.environ.get('STATIC_MANIFEST', '0' if DEBUG else '1') == '1'
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': (
+            'whitenoise.storage.CompressedManifestStaticFilesStorage' if STATIC_MANIFEST
+            else 'django.contrib.staticfiles.storage.StaticFilesStorage'
+        ),
+    },
+}
+# Development under uvicorn: serve straight from STATICFILES_DIRS, no build needed
+WHITENOISE_USE_FINDERS = DEBUG
+WHITENOISE_AUTOREFRESH = DEBUG
 
 MEDIA_URL = 'media/'
 # MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
@@ -136,6 +251,23 @@ AUTHENTICATION_BACKENDS = [
     'core.backend.PhoneOrEmailBackend',
     'django.contrib.auth.backends.ModelBackend',
 ]
+# Seconds the phone -> user id mapping used by PhoneOrEmailBackend stays cached
+LOGIN_IDENTIFIER_CACHE_TIMEOUT = 60
+# Login attempts allowed before password hashing (core.throttle), as sliding windows
+# (attempts, seconds) per client IP and per email/phone
+LOGIN_THROTTLE_ENABLED = os.environ.get('LOGIN_THROTTLE_ENABLED', '1') == '1'
+LOGIN_THROTTLE_CACHE = 'default'
+LOGIN_THROTTLE_RATES = {
+    'ip': (30, 60),
+    'identifier': (5, 300),
+}
+# Sessions are read from the cache and only written through to the database
+SESSION_ENGINE = os.environ.get('SESSION_ENGINE', 'django.contrib.sessions.backends.cached_db')
+# Logged in user (with its profile) loaded by PhoneOrEmailBackend.get_user from
+# RepositoryCache('session_user'); invalidated by auths.signals on User/Profile save and logout.
+# Kept only in the shared cache (no in-process tier), so it is on by default only when
+# that cache is shared by every worker (REDIS_URL): with LocMem each worker has its own copy.
+AUTH_USER_CACHE_ENABLED = os.environ.get('AUTH_USER_CACHE_ENABLED', '1' if REDIS_URL else '0') == '1'
 
 # Email settings
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
@@ -144,4 +276,10 @@ EMAIL_PORT = 587
 EMAIL_USE_TLS = True
 EMAIL_HOST_USER = 'domingoscesar2001@gmail.com'  # Your Gmail address
 EMAIL_HOST_PASSWORD = 'rdwmomcufnkjayip'  # Your app password
-DEFAULT_FROM_EMAIL = 'domingoscesar2001@gmail.com'
\ No newline at end of file
+DEFAULT_FROM_EMAIL = 'domingoscesar2001@gmail.com'
+
+# Outbox: emails are queued by core.mail.queue_mail and delivered by
+# `python manage.py send_queued_mail --loop`
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+EMAIL_OUTBOX_CLAIM_SECONDS = 300 # a message taken by a worker that died is due again after this
+EMAIL_OUTBOX_RETRY_DELAY = 60 # seconds, doubled on each attempt
\ No newline at end of file
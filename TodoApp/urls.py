@@ -6,4 +6,5 @@ urlpatterns = [
     path('auth/', include('auths.urls')),
     path('', include('core.urls')),
     path('task/', include('task.urls')),
+    path('api/', include('api.urls')),
 ]
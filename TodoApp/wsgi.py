@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'TodoApp.settings')
 
 application = get_wsgi_application()
+
+# Fail now rather than with a 500 on every page when the static build is missing
+# (imported here: needs the settings loaded above)
+from core.assets import check_manifest
+check_manifest()
@@ -0,0 +1,63 @@
+from rest_framework import serializers
+from task.models import Task, Category
+
+
+class CategoryField(serializers.Field):
+    """
+        Category id resolved through `context['categories']` (id -> Category),
+        loaded once per request instead of one query per item.
+    """
+    default_error_messages = {
+        'does_not_exist': 'Categoria "{pk}" não existe.',
+        'incorrect_type': 'Tipo incorreto, esperado o id da categoria.',
+    }
+
+    def to_internal_value(self, data):
+        if data in (None, ''):
+            return None
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type')
+        category = self.context.get('categories', {}).get(pk)
+        if category is None:
+            self.fail('does_not_exist', pk=pk)
+        return category
+
+    def get_attribute(self, instance):
+        # Read the raw id: no query for the related category
+        return instance.category_id
+
+    def to_representation(self, value):
+        return value
+
+
+class TaskSerializer(serializers.ModelSerializer):
+    category = CategoryField(required=False, allow_null=True)
+
+    class Meta:
+        model = Task
+        fields = [
+            'id', 'title', 'description', 'category', 'date_expired', 'priority', 'status',
+            'progress_points', 'concluded', 'date_creation', 'date_update',
+        ]
+        read_only_fields = ['id', 'concluded', 'date_creation', 'date_update']
+
+
+class CategorySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Category
+        fields = ['id', 'name', 'color', 'date_creation', 'date_update']
+
+
+class TaskBulkSerializer(serializers.Serializer):
+    """ Envelope of POST /api/tasks/bulk/ """
+    create = serializers.ListField(child=serializers.DictField(), required=False, default=list)
+    update = serializers.ListField(child=serializers.DictField(), required=False, default=list)
+    delete = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+
+    def validate(self, attrs):
+        limit = self.context.get('max_items', 500)
+        if len(attrs['create']) + len(attrs['update']) + len(attrs['delete']) > limit:
+            raise serializers.ValidationError(f'No máximo {limit} itens por pedido.')
+        return attrs
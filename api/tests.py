@@ -1,3 +1,135 @@
+import base64
+import json
+from datetime import timedelta
+
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from auths.models import User
+from core.pagination import encode_positions
+from task.models import Task, Category, Progress, Tombstone
+
+
+class TaskBulkViewTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='lote', email='lote@mail.com', password='senha12345')
+        self.other = User.objects.create_user(username='outro', email='outro@mail.com', password='senha12345')
+        self.client.force_login(self.user)
+
+    def bulk(self, body):
+        return self.client.post(reverse('api_task_bulk'), body, content_type='application/json')
+
+    def test_valid_items_are_applied_and_invalid_ones_reported(self):
+        category = Category.objects.create(name='Casa', user=self.user)
+        foreign = Category.objects.create(name='Alheia', user=self.other)
+        task = Task.objects.create(title='Antiga', user=self.user)
+        removed = Task.objects.create(title='Apagar', user=self.user)
+        not_mine = Task.objects.create(title='De outro', user=self.other)
+
+        response = self.bulk({
+            "create": [{"title": "Nova", "category": category.pk}, {"title": "Ruim", "category": foreign.pk}, {"priority": "ALTA"}],
+            "update": [{"id": task.pk, "status": "CONCLUIDA"}, {"id": not_mine.pk, "title": "Roubada"}],
+            "delete": [removed.pk, not_mine.pk],
+        })
+        self.assertEqual(response.status_code, 200)
+        results = response.json()
+        self.assertEqual([item["status"] for item in results["create"]], ["created", "error", "error"])
+        self.assertEqual([item["status"] for item in results["update"]], ["updated", "error"])
+        self.assertEqual([item["status"] for item in results["delete"]], ["deleted", "error"])
+
+        created = Task.objects.get(pk=results["create"][0]["id"])
+        self.assertEqual((created.user, created.category), (self.user, category))
+        self.assertEqual(Progress.objects.get(task=task).percentage, 100)
+        self.assertFalse(Task.objects.filter(pk=removed.pk).exists())
+        self.assertTrue(Tombstone.objects.filter(user=self.user, model='task', object_id=removed.pk).exists())
+        self.assertEqual(Task.objects.get(pk=not_mine.pk).title, 'De outro')
+
+    def test_too_many_items(self):
+        response = self.bulk({"delete": list(range(1, 502))})
+        self.assertEqual(response.status_code, 400)
+
+
+class SyncViewTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='sync', email='sync@mail.com', password='senha12345')
+        self.client.force_login(self.user)
+
+    def sync(self, cursor=None):
+        return self.client.get(reverse('api_sync'), {'cursor': cursor} if cursor else {})
+
+    def test_unchanged_old_stream_does_not_expire_the_cursor(self):
+        category = Category.objects.create(name='Antiga', user=self.user)
+        Category.objects.filter(pk=category.pk).update(date_update=timezone.now() - timedelta(days=60))
+        response = self.sync()
+        self.assertEqual(len(response.json()['categories']), 1)
+        for _ in range(2):
+            response = self.sync(response.json()['cursor'])
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['categories'], [])
+
+    def test_cursor_issued_before_the_tombstone_purge_is_gone(self):
+        issued = timezone.now() - timedelta(days=31)
+        cursor = encode_positions({'tasks': (issued, 1)}, issued)
+        response = self.sync(cursor)
+        self.assertEqual(response.status_code, 410)
+        self.assertTrue(response.json()['reset'])
+
+    def test_unreadable_cursor_is_gone(self):
+        self.assertEqual(self.sync('lixo').status_code, 410)
+        for raw in [
+            {"issued": timezone.now().isoformat(), "positions": []},
+            {"issued": "2026-10-18T00:00:00", "positions": {}},
+            {"issued": timezone.now().isoformat(), "positions": {"tasks": ["2026-10-18T00:00:00", 1]}},
+            {"issued": timezone.now().isoformat(), "positions": {"tasks": "x"}},
+            ["não", "é", "um", "objeto"],
+        ]:
+            cursor = base64.urlsafe_b64encode(json.dumps(raw).encode()).decode()
+            response = self.sync(cursor)
+            self.assertEqual(response.status_code, 410, raw)
+            self.assertTrue(response.json()['reset'])
+
+    def test_row_committed_late_is_not_skipped(self):
+        Task.objects.create(title='Primeira', user=self.user)
+        cursor = self.sync().json()['cursor']
+        # Stamped before the cursor above was issued, committed only now
+        late = Task.objects.create(title='Atrasada', user=self.user)
+        Task.objects.filter(pk=late.pk).update(date_update=timezone.now() - timedelta(seconds=5))
+        ids = [task['id'] for task in self.sync(cursor).json()['tasks']]
+        self.assertIn(late.pk, ids)
+
+    def test_bulk_changes_reach_the_next_sync(self):
+        task = Task.objects.create(title='Sincronizada', user=self.user)
+        Task.objects.filter(pk=task.pk).update(date_update=timezone.now() - timedelta(hours=1))
+        cursor = self.sync().json()['cursor']
+        self.client.post(reverse('api_task_bulk'), {"delete": [task.pk]}, content_type='application/json')
+        self.assertEqual(self.sync(cursor).json()['deleted'], [{"model": "task", "id": task.pk}])
+
+    def test_rows_older_than_the_lag_are_not_sent_twice(self):
+        task = Task.objects.create(title='Velha', user=self.user)
+        Task.objects.filter(pk=task.pk).update(date_update=timezone.now() - timedelta(hours=1))
+        cursor = self.sync().json()['cursor']
+        self.assertEqual(self.sync(cursor).json()['tasks'], [])
+
+
+class TaskSearchViewTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='busca', email='busca@mail.com', password='senha12345')
+        self.other = User.objects.create_user(username='outro', email='outro@mail.com', password='senha12345')
+        self.client.force_login(self.user)
+
+    def test_ranked_pages_of_the_users_tasks(self):
+        Task.objects.create(title='Semana', description='Ir ao mercado', user=self.user)
+        Task.objects.create(title='Mercado', user=self.user)
+        Task.objects.create(title='Mercado', user=self.other)
+        response = self.client.get(reverse('api_task_search'), {'q': 'merc', 'limit': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([task['title'] for task in response.json()['results']], ['Mercado'])
+        self.assertEqual(response.json()['next_page'], 2)
+        response = self.client.get(reverse('api_task_search'), {'q': 'merc', 'limit': 1, 'page': 2})
+        self.assertEqual([task['title'] for task in response.json()['results']], ['Semana'])
+        self.assertIsNone(response.json()['next_page'])
 
-# Create your tests here.
+    def test_invalid_queries(self):
+        self.assertEqual(self.client.get(reverse('api_task_search')).status_code, 400)
+        self.assertEqual(self.client.get(reverse('api_task_search'), {'q': 'x', 'page': 'um'}).status_code, 400)
@@ -0,0 +1,8 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('tasks/bulk/', views.TaskBulkView.as_view(), name='api_task_bulk'),
+    path('tasks/search/', views.TaskSearchView.as_view(), name='api_task_search'),
+    path('sync/', views.SyncView.as_view(), name='api_sync'),
+]
@@ -1,3 +1,188 @@
-from django.shortcuts import render
+from datetime import timedelta
 
-# Create your views here.
+from django.conf import settings
+from django.db.models import Exists
+from django.utils import timezone
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
+
+from auths.models import User
+from core.db_router import replica_reads
+from core.pagination import encode_positions, decode_positions, after_position
+from task.models import Task, Category, Tombstone
+from task.services import TaskService
+from .serializers import TaskSerializer, CategorySerializer, TaskBulkSerializer
+
+
+class TaskBulkView(APIView):
+    """
+        Apply arrays of creates, updates and deletes of the logged user's tasks in one transaction.
+        
+        Body: {"create": [{...}], "update": [{"id": 1, ...}], "delete": [2, 3]}
+        Invalid items are skipped and reported; the valid ones are all applied together.
+    """
+    service = TaskService()
+    max_items = 500
+    
+    def get_categories(self, request, items):
+        ids = {item.get('category') for item in items}
+        ids = [int(pk) for pk in ids if isinstance(pk, int) or (isinstance(pk, str) and pk.isdigit())]
+        return Category.objects.filter(user=request.user, id__in=ids).in_bulk()
+    
+    def post(self, request, *args, **kwargs):
+        envelope = TaskBulkSerializer(data=request.data, context={'max_items': self.max_items})
+        envelope.is_valid(raise_exception=True)
+        data = envelope.validated_data
+        context = {'categories': self.get_categories(request, data['create'] + data['update'])}
+        repository = self.service.getRepository()
+        
+        creates, create_results = [], []
+        for index, item in enumerate(data['create']):
+            serializer = TaskSerializer(data=item, context=context)
+            if serializer.is_valid():
+                creates.append(serializer.validated_data)
+                create_results.append({"index": index, "status": "created"})
+            else:
+                create_results.append({"index": index, "status": "error", "errors": serializer.errors})
+        
+        ids = [item.get('id') for item in data['update']]
+        tasks = repository.getModel().objects.filter(user=request.user, id__in=[pk for pk in ids if isinstance(pk, int)]).in_bulk()
+        updates, update_results, seen = [], [], set()
+        for index, item in enumerate(data['update']):
+            task = tasks.get(item.get('id'))
+            if task is None or task.id in seen:
+                update_results.append({"index": index, "id": item.get('id'), "status": "error", "errors": {"id": ["Tarefa não encontrada."]}})
+                continue
+            serializer = TaskSerializer(task, data=item, partial=True, context=context)
+            if serializer.is_valid():
+                for field, value in serializer.validated_data.items():
+                    setattr(task, field, value)
+                updates.append(task)
+                seen.add(task.id)
+                update_results.append({"index": index, "id": task.id, "status": "updated"})
+            else:
+                update_results.append({"index": index, "id": task.id, "status": "error", "errors": serializer.errors})
+        
+        created, deleted_ids = self.service.bulkSync(request.user, creates, updates, data['delete'])
+        
+        created = iter(created)
+        for result in create_results:
+            if result["status"] == "created":
+                result["id"] = next(created).id
+        deleted_ids = set(deleted_ids)
+        delete_results = [
+            {"id": pk, "status": "deleted"} if pk in deleted_ids else
+            {"id": pk, "status": "error", "errors": {"id": ["Tarefa não encontrada."]}}
+            for pk in data['delete']
+        ]
+        
+        return Response({
+            "create": create_results,
+            "update": update_results,
+            "delete": delete_results,
+        }, status=status.HTTP_200_OK)
+
+
+class SyncView(APIView):
+    """
+        Changes of the logged user since a cursor: GET /api/sync/?cursor=<cursor>&limit=200
+        
+        Each stream (tasks, categories, deleted) is read in (date_update, id) order after its
+        own position stored in the cursor. With nothing new the request is a single SELECT
+        of three EXISTS probes on the (user, date_update, id) indexes.
+        
+        date_update is stamped before the row commits, so positions never move past
+        now - settings.SYNC_SAFETY_LAG: rows of that window may be sent twice, never skipped.
+    """
+    default_limit = 200
+    max_limit = 1000
+    
+    def get_streams(self, user):
+        return {
+            'tasks': (Task.objects.filter(user=user), 'date_update', TaskSerializer),
+            'categories': (Category.objects.filter(user=user), 'date_update', CategorySerializer),
+            'deleted': (Tombstone.objects.filter(user=user), 'date_deleted', None),
+        }
+    
+    def has_changes(self, user, streams, positions):
+        probes = {
+            f'changed_{name}': Exists(after_position(queryset, field, positions.get(name)))
+            for name, (queryset, field, serializer) in streams.items()
+        }
+        flags = User.objects.filter(pk=user.pk).annotate(**probes).values(*probes).first()
+        return bool(flags) and any(flags.values())
+    
+    @replica_reads()
+    def get(self, request, *args, **kwargs):
+        cursor = request.query_params.get('cursor')
+        positions, issued = decode_positions(cursor)
+        try:
+            limit = min(int(request.query_params.get('limit', self.default_limit)), self.max_limit)
+        except ValueError:
+            limit = self.default_limit
+        
+        now = timezone.now()
+        horizon = now - timedelta(seconds=getattr(settings, 'SYNC_SAFETY_LAG', 30))
+        if cursor:
+            # Tombstones older than SYNC_TOMBSTONE_DAYS are purged: a client that has not
+            # synced since then (or sends an unreadable cursor) may have missed deletions
+            oldest = now - timedelta(days=getattr(settings, 'SYNC_TOMBSTONE_DAYS', 30))
+            if issued is None or issued < oldest:
+                return Response({"reset": True, "detail": "Cursor expirado, sincronize novamente."}, status=status.HTTP_410_GONE)
+        
+        streams = self.get_streams(request.user)
+        data = {name: [] for name in streams}
+        if positions and not self.has_changes(request.user, streams, positions):
+            return Response({**data, "cursor": encode_positions(positions, now), "has_more": False})
+        
+        has_more = False
+        for name, (queryset, field, serializer) in streams.items():
+            queryset = after_position(queryset, field, positions.get(name))
+            if serializer is None:
+                queryset = queryset.values('id', 'model', 'object_id', field)
+            rows = list(queryset[:limit + 1])
+            more = len(rows) > limit
+            rows = rows[:limit]
+            if not rows:
+                continue
+            last = rows[-1]
+            if serializer is None:
+                position = (last[field], last['id'])
+                data[name] = [{"model": row['model'], "id": row['object_id']} for row in rows]
+            else:
+                position = (getattr(last, field), last.id)
+                data[name] = serializer(rows, many=True).data
+            if position[0] > horizon:
+                # Rows still inside the lag window are read again by the next call
+                position, more = (horizon, 0), False
+            positions[name] = max(position, positions.get(name) or position)
+            has_more = has_more or more
+        
+        return Response({**data, "cursor": encode_positions(positions, now), "has_more": has_more})
+
+
+class TaskSearchView(APIView):
+    """
+        Ranked full-text search of the logged user's tasks: GET /api/tasks/search/?q=<text>&page=1&limit=20
+    """
+    service = TaskService()
+    default_limit = 20
+    max_limit = 100
+    
+    @replica_reads()
+    def get(self, request, *args, **kwargs):
+        query = request.query_params.get('q', '').strip()
+        try:
+            page = max(int(request.query_params.get('page', 1)), 1)
+            limit = min(max(int(request.query_params.get('limit', self.default_limit)), 1), self.max_limit)
+        except ValueError:
+            return Response({"detail": "Parâmetros page/limit inválidos."}, status=status.HTTP_400_BAD_REQUEST)
+        if not query:
+            return Response({"detail": "Informe o texto da pesquisa em q."}, status=status.HTTP_400_BAD_REQUEST)
+        tasks, has_next = self.service.getRepository().searchTasks(request.user, query, page=page, limit=limit)
+        return Response({
+            "results": TaskSerializer(tasks, many=True).data,
+            "page": page,
+            "next_page": page + 1 if has_next else None,
+        })
@@ -0,0 +1,48 @@
+import re
+
+from django.db import migrations, models
+
+
+def normalize_phone_number(value):
+    """ Frozen copy of auths.models.normalize_phone_number as of this migration """
+    if not value:
+        return None
+    value = value.strip()
+    digits = re.sub(r'\D', '', value)
+    if not digits:
+        return None
+    return ('+' + digits) if value.startswith('+') else digits
+
+
+def fill_phone_normalized(apps, schema_editor):
+    Profile = apps.get_model('auths', 'Profile')
+    seen = set()
+    profiles = Profile.objects.exclude(phone_number__isnull=True).exclude(phone_number='').order_by('id')
+    for profile in profiles.iterator(chunk_size=2000):
+        normalized = normalize_phone_number(profile.phone_number)
+        # Keep the oldest profile when two of them share the same number
+        if not normalized or normalized in seen:
+            continue
+        seen.add(normalized)
+        Profile.objects.filter(pk=profile.pk).update(phone_normalized=normalized)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auths', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='phone_normalized',
+            field=models.CharField(blank=True, editable=False, max_length=255, null=True),
+        ),
+        migrations.RunPython(fill_phone_normalized, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='profile',
+            name='phone_normalized',
+            field=models.CharField(blank=True, editable=False, max_length=255, null=True, unique=True),
+        ),
+    ]
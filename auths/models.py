@@ -1,8 +1,11 @@
-from django.db import models
+from django.db import models, transaction, IntegrityError
 from django.contrib.auth.models import AbstractUser
+from django.core.exceptions import ValidationError
+from core.models import DirtyFieldsMixin
+import re
 
 
-class User(AbstractUser):
+class User(DirtyFieldsMixin, AbstractUser):
     # Modelo User herda de AbstractUser para incluir campos como username, se desejar;
     # Senao, use model.Model
     
@@ -27,7 +30,24 @@ class User(AbstractUser):
         return self.username
 
 
-class Profile(models.Model):
+def normalize_phone_number(value):
+    """
+        Canonical form used for phone lookups: digits only, keeping a leading '+'.
+        Ex: '+244 923-456-789' -> '+244923456789'
+    """
+    if not value:
+        return None
+    value = value.strip()
+    digits = re.sub(r'\D', '', value)
+    if not digits:
+        return None
+    return ('+' + digits) if value.startswith('+') else digits
+
+
+PHONE_TAKEN_MESSAGE = 'Este número de telefone já está em uso por outra conta.'
+
+
+class Profile(DirtyFieldsMixin, models.Model):
     """
         Profile extended of user (relationship 1:1)
     """
@@ -35,6 +55,7 @@ class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profiles')
     avatar_url = models.URLField(max_length=255, blank=True, null=True)
     phone_number = models.CharField(verbose_name='numero telefonico', max_length=255, null=True, blank=True)
+    phone_normalized = models.CharField(max_length=255, unique=True, null=True, blank=True, editable=False) # Indexed lookup for phone login
     birth_date = models.DateField(verbose_name='data de nascimento', null=True, blank=True)
     bio = models.TextField(blank=True, null=True)
     preference = models.JSONField(default=dict) # Ex: {"tema":"dark", "idioma":"pt"} 
@@ -45,4 +66,30 @@ class Profile(models.Model):
         verbose_name_plural = 'Profiles'
         
     def __str__(self):
-        return self.user.username
\ No newline at end of file
+        return self.user.username
+    
+    def phone_is_taken(self, normalized):
+        return Profile.objects.filter(phone_normalized=normalized).exclude(pk=self.pk).exists()
+    
+    def clean(self):
+        # ModelForms (ex: the admin) show the error on the field instead of failing on save
+        normalized = normalize_phone_number(self.phone_number)
+        if normalized and self.phone_is_taken(normalized):
+            raise ValidationError({'phone_number': PHONE_TAKEN_MESSAGE})
+    
+    def save(self, *args, **kwargs):
+        normalized = normalize_phone_number(self.phone_number)
+        self.phone_normalized = normalized
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'phone_number' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'phone_normalized'}
+        if self.is_unchanged(**kwargs):
+            return
+        try:
+            # Savepoint: the unique index is the real check, clean() can race with another save
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+        except IntegrityError:
+            if normalized and self.phone_is_taken(normalized):
+                raise ValidationError({'phone_number': PHONE_TAKEN_MESSAGE})
+            raise
\ No newline at end of file
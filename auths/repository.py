@@ -1,5 +1,33 @@
+import hashlib
+
+from django.conf import settings
+
+from core.cache import RepositoryCache
 from .models import User, Profile
 
+user_cache = RepositoryCache('user')
+# email -> user id, resolved through user_cache
+user_email_cache = RepositoryCache('user_email')
+# User of the session with its profile, for AuthenticationMiddleware. Shared tier only:
+# a password change, deactivation or logout must reach every worker at once
+session_user_cache = RepositoryCache('session_user', local=False)
+
+
+def invalidate_cached_user(user_id):
+    if getattr(settings, 'AUTH_USER_CACHE_ENABLED', False):
+        session_user_cache.invalidate(user_id)
+    if getattr(settings, 'REPOSITORY_CACHE_ENABLED', False):
+        user_cache.invalidate(user_id)
+
+
+def get_session_user(user_id):
+    """ User (with `profiles` loaded) of an authenticated session, cached when AUTH_USER_CACHE_ENABLED """
+    def load():
+        return User.objects.select_related('profiles').filter(pk=user_id).first()
+    if not getattr(settings, 'AUTH_USER_CACHE_ENABLED', False):
+        return load()
+    return session_user_cache.get_or_load(user_id, load)
+
 
 class UserRepository:
     def __init__(self, model:User):
@@ -38,4 +66,29 @@ class UserRepository:
             return None
         except self.__model.MultipleObjectsReturned:
             print("Multiple users with this email exist!")
-            return None
\ No newline at end of file
+            return None
+
+
+class CachedUserRepository(UserRepository):
+    """
+        UserRepository with getUserById/getUserByEmail served by RepositoryCache.
+        Enabled with settings.REPOSITORY_CACHE_ENABLED; writes are invalidated by auths.signals.
+    """
+    def getUserById(self, id:int):
+        load = super().getUserById
+        return user_cache.get_or_load(id, lambda: load(id=id))
+    
+    def getUserByEmail(self, email:str):
+        if not email:
+            return super().getUserByEmail(email)
+        key = hashlib.md5(email.encode()).hexdigest()
+        load = super().getUserByEmail
+        user_id = user_email_cache.get_or_load(key, lambda: getattr(load(email), 'pk', None))
+        if user_id is None:
+            return None
+        user = self.getUserById(user_id)
+        if user is None or user.email != email:
+            # The email changed since the mapping was cached
+            user_email_cache.invalidate(key)
+            return load(email)
+        return user
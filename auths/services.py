@@ -1,11 +1,13 @@
-from .repository import UserRepository
+from django.conf import settings
+from .repository import UserRepository, CachedUserRepository
 from .models import User
 
 
 class UserService:
     def __init__(self, repository=None):
         if repository is None:
-            self.__repository = UserRepository(User)
+            repository_class = CachedUserRepository if settings.REPOSITORY_CACHE_ENABLED else UserRepository
+            self.__repository = repository_class(User)
         else:
             self.__repository = repository
         
@@ -1,7 +1,11 @@
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_save, pre_save, post_delete
 from django.dispatch import receiver
-from auths.models import User, Profile
-from .utils import send_mail, send_welcome_email, send_profile_update_email
+from django.contrib.auth.signals import user_logged_out
+from django.core.cache import cache
+from auths.models import User, Profile, normalize_phone_number
+from core.backend import phone_cache_key
+from .repository import invalidate_cached_user
+from .utils import send_welcome_email, send_profile_update_email
 
 @receiver(post_save, sender=User)
 def create_profile(sender, instance, created, **kwargs):
@@ -14,15 +18,43 @@ def create_profile(sender, instance, created, **kwargs):
     
 @receiver(post_save, sender=User)
 def save_profile(sender, instance, **kwargs):
-    instance.profiles.save()
+    # Only a profile already loaded through the user can carry edits: don't fetch it
+    # (ex: the last_login update of every login). Unchanged profiles are not written.
+    if User.profiles.is_cached(instance):
+        instance.profiles.save()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user(sender, instance, **kwargs):
+    invalidate_cached_user(instance.pk)
+
+
+@receiver(post_save, sender=Profile)
+def invalidate_profile_user(sender, instance, **kwargs):
+    # The cached session user carries its profile
+    invalidate_cached_user(instance.user_id)
+
+
+@receiver(user_logged_out)
+def forget_logged_out_user(sender, request, user, **kwargs):
+    if user is not None:
+        invalidate_cached_user(user.pk)
 
 @receiver(pre_save, sender=Profile)
 def profile_pre_save(sender, instance, **kwargs):
     """Send email notification when profile is updated"""
     if instance.pk:  # If profile already exists (update)
-        old_profile = Profile.objects.get(pk=instance.pk)
+        # Values as loaded (DirtyFieldsMixin); only profiles built by hand need a query
+        if hasattr(instance, '_loaded_values'):
+            old_normalized = instance.get_loaded_value('phone_normalized')
+        else:
+            old_normalized = Profile.objects.filter(pk=instance.pk).values_list('phone_normalized', flat=True).first()
+        # Forget the cached phone -> user mapping when the number changes
+        if old_normalized and old_normalized != normalize_phone_number(instance.phone_number):
+            cache.delete(phone_cache_key(old_normalized))
         # Check if any important fields changed
         fields_to_check = ['bio', 'birth_date', 'phone_number']
-        # if any(getattr(old_profile, field) != getattr(instance, field) for field in fields_to_check):
+        # if instance.get_dirty_fields() & set(fields_to_check):
             # if instance.user.email:
             #     send_profile_update_email(instance.user)
\ No newline at end of file
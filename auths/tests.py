@@ -1,3 +1,76 @@
-from django.test import TestCase
+from django.contrib.auth import authenticate
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 
-# Create your tests here.
+from .models import User, Profile
+from .repository import session_user_cache
+
+
+class PhoneLoginTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='telefone', email='telefone@mail.com', password='senha12345')
+        self.user.profiles.phone_number = '+244 923-456-789'
+        self.user.profiles.save()
+
+    def test_login_with_any_spelling_of_the_number(self):
+        self.assertEqual(Profile.objects.get(user=self.user).phone_normalized, '+244923456789')
+        self.assertEqual(authenticate(identifier='+244 923 456 789', password='senha12345'), self.user)
+        self.assertIsNone(authenticate(identifier='+244923456789', password='errada123'))
+        response = self.client.post(reverse('login'), {'identifier': '+244923456789', 'password': 'senha12345'})
+        self.assertRedirects(response, reverse('index'), fetch_redirect_response=False)
+
+    def test_number_of_another_account_is_rejected(self):
+        other = User.objects.create_user(username='outro', email='outro@mail.com', password='senha12345').profiles
+        other.phone_number = '+244923456789'
+        with self.assertRaises(ValidationError) as raised:
+            other.full_clean()
+        self.assertIn('phone_number', raised.exception.message_dict)
+        # Saved without validation (or racing the check): refused by the unique index
+        with self.assertRaises(ValidationError):
+            other.save()
+        self.assertIsNone(Profile.objects.get(pk=other.pk).phone_normalized)
+        self.assertEqual(authenticate(identifier='+244923456789', password='senha12345'), self.user)
+
+
+@override_settings(AUTH_USER_CACHE_ENABLED=True)
+class SessionUserCacheTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.user = User.objects.create_user(username='sessao', email='sessao@mail.com', password='senha12345')
+        self.client.force_login(self.user)
+
+    def auth_queries(self):
+        with CaptureQueriesContext(connection) as captured:
+            self.assertEqual(self.client.get(reverse('index')).status_code, 200)
+        return [query['sql'] for query in captured if '"auths_user"' in query['sql'] or '"auths_profile"' in query['sql']]
+
+    def test_warm_request_does_not_query_the_user(self):
+        self.assertTrue(self.auth_queries())
+        self.assertEqual(self.auth_queries(), [])
+
+    def test_user_and_profile_saves_reload_the_user(self):
+        self.auth_queries()
+        self.user.first_name = 'Novo'
+        self.user.save()
+        self.assertTrue(self.auth_queries())
+        profile = Profile.objects.get(user=self.user)
+        profile.bio = 'Outra'
+        profile.save()
+        self.assertTrue(self.auth_queries())
+        # A deactivated user is logged out on the next request
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(reverse('index')).status_code, 302)
+
+    def test_logout_forgets_the_user(self):
+        self.auth_queries()
+        self.client.get(reverse('logout'))
+        self.assertIsNone(session_user_cache.get_shared().get(session_user_cache.make_key(self.user.pk)))
+
+    def test_no_in_process_copy(self):
+        self.auth_queries()
+        self.assertEqual(len(session_user_cache.local), 0)
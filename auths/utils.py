@@ -1,4 +1,4 @@
-from django.core.mail import send_mail
+from core.mail import queue_mail
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 from django.conf import settings
@@ -13,13 +13,12 @@ def send_welcome_email(user):
     })
     plain_message = strip_tags(html_message)
     
-    send_mail(
+    queue_mail(
         subject,
         plain_message,
         settings.DEFAULT_FROM_EMAIL,
         [user.email],
         html_message=html_message,
-        fail_silently=False,
     )
 
 def send_profile_update_email(user):
@@ -32,13 +31,12 @@ def send_profile_update_email(user):
     })
     plain_message = strip_tags(html_message)
     
-    send_mail(
+    queue_mail(
         subject,
         plain_message,
         settings.DEFAULT_FROM_EMAIL,
         [user.email],
         html_message=html_message,
-        fail_silently=False,
     )
 
 def send_reset_password_email(user):
@@ -52,11 +50,10 @@ def send_reset_password_email(user):
     
     plain_message = strip_tags(html_message)
     
-    send_mail(
+    queue_mail(
         subject,
         plain_message,
         settings.DEFAULT_FROM_EMAIL,
         [user.email],
         html_message=html_message,
-        fail_silently=False,
     )
\ No newline at end of file
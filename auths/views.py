@@ -6,6 +6,8 @@ from auths.services import UserService
 from .forms import UserRegisterForm, UserLoginForm, PassWordResetForm
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth import authenticate, login, logout
+from core.throttle import throttle_login
+import math
 # Create your views here.
 
 
@@ -48,6 +50,14 @@ class AuthLogin(View):
         if form.is_valid():
             identifier = form.cleaned_data['identifier']
             password = form.cleaned_data['password']
+            # Reject bursts before authenticate() spends a password hash on them
+            wait = throttle_login(request, identifier)
+            if wait:
+                wait = math.ceil(wait)
+                form.add_error(None, f'Muitas tentativas de login. Tente novamente em {wait} segundo(s).')
+                response = render(request, self.template_name, {'name':self.name, 'form':form}, status=429)
+                response['Retry-After'] = str(wait)
+                return response
             # pass identifier (email or phone) to authentication backend
             user = authenticate(request, identifier=identifier, password=password)
             if user is not None:
@@ -0,0 +1,62 @@
+"""
+    Static asset build used by `python manage.py build_static`.
+
+    Runs collectstatic with WhiteNoise's CompressedManifestStaticFilesStorage whatever
+    the STORAGES setting of the current process, so the build works from a DEBUG
+    checkout too: files get content hashed names, the staticfiles.json manifest and
+    gzip (plus brotli, when the Brotli package is installed) copies.
+"""
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles.finders import FileSystemFinder
+from django.contrib.staticfiles.management.commands import collectstatic
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+
+def _size(path):
+    return os.path.getsize(path) if os.path.exists(path) else None
+
+
+def build_static(clear=True, verbosity=0):
+    """
+        Collect, hash and compress every static file into STATIC_ROOT.
+        Returns the project's own files (STATICFILES_DIRS) as
+        [{"name", "hashed", "bytes", "gzip", "brotli"}, ...] with sizes in bytes.
+    """
+    storage = CompressedManifestStaticFilesStorage()
+    command = collectstatic.Command()
+    command.storage = storage
+    call_command(command, interactive=False, clear=clear, verbosity=verbosity)
+
+    own = {path.replace(os.sep, '/') for path, _ in FileSystemFinder().list([])}
+    files = []
+    for name, hashed in sorted(storage.hashed_files.items()):
+        if name not in own:
+            continue
+        path = storage.path(hashed)
+        files.append({
+            "name": name,
+            "hashed": hashed,
+            "bytes": _size(path),
+            "gzip": _size(path + '.gz'),
+            "brotli": _size(path + '.br'),
+        })
+    return files
+
+
+def check_manifest():
+    """
+        Called by TodoApp.wsgi/asgi: with STATIC_MANIFEST on, a missing build makes every
+        page that links a static file fail with a 500, so refuse to start instead.
+    """
+    if not settings.STATIC_MANIFEST:
+        return
+    path = os.path.join(settings.STATIC_ROOT, CompressedManifestStaticFilesStorage.manifest_name)
+    if not os.path.exists(path):
+        raise ImproperlyConfigured(
+            f'{path} not found: run `python manage.py build_static` before starting the server '
+            '(or set STATIC_MANIFEST=0 to serve unhashed files).'
+        )
@@ -1,21 +1,45 @@
 import re
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
 from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth import get_user_model
+from auths.models import normalize_phone_number
+from auths.repository import get_session_user
 
 User = get_user_model()
 
 
+def phone_cache_key(normalized):
+    return f'auth:phone:{normalized}'
+
+
 class PhoneOrEmailBackend(ModelBackend):
     """
     Authenticate a user using either their email address or their phone number.
 
     Looks for an `identifier` argument first, then `username`. If the identifier
     looks like an email, it will search the User.email field. Otherwise it will
-    try to find a related Profile with a matching `phone_number`.
+    normalize the number and look it up on the unique `Profile.phone_normalized`
+    index. The phone -> user id mapping is kept for a short time in the cache.
     """
 
     email_regex = re.compile(r'^[\w\.-]+@[\w\.-]+\.\w+$')
 
+    def get_user_by_phone(self, ident):
+        normalized = normalize_phone_number(ident)
+        if not normalized:
+            return None
+        key = phone_cache_key(normalized)
+        user_id = cache.get(key)
+        if user_id is not None:
+            user = User.objects.filter(pk=user_id).first()
+            if user: return user
+        user = User.objects.filter(profiles__phone_normalized=normalized).first()
+        if user:
+            cache.set(key, user.pk, timeout=getattr(settings, 'LOGIN_IDENTIFIER_CACHE_TIMEOUT', 60))
+        return user
+
     def authenticate(self, request, username=None, password=None, identifier=None, **kwargs):
         ident = identifier or username or kwargs.get('email')
         if not ident or not password:
@@ -26,19 +50,19 @@ class PhoneOrEmailBackend(ModelBackend):
             if self.email_regex.match(ident):
                 user = User.objects.get(email__iexact=ident)
             else:
-                # try to find user via related Profile.phone_number (safe)
-                for u in User.objects.all():
-                    profile = getattr(u, 'profiles', None)
-                    if profile and profile.phone_number == ident:
-                        user = u
-                        break
-                # fallback: maybe phone_number stored on User directly
-                if not user and hasattr(User, 'phone_number'):
-                    user = User.objects.filter(phone_number=ident).first()
+                user = self.get_user_by_phone(ident)
 
             if user and user.check_password(password):
                 return user
         except User.DoesNotExist:
             return None
 
-        return None
\ No newline at end of file
+        return None
+
+    def get_user(self, user_id):
+        # Called by AuthenticationMiddleware on every request: served from the cache
+        user = get_session_user(user_id)
+        return user if user is not None and self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        return await sync_to_async(self.get_user)(user_id)
@@ -0,0 +1,198 @@
+"""
+    In-process benchmark of the main request paths, used by `python manage.py bench`.
+
+    Data is seeded with bulk_create into a throwaway test database, then every path
+    is requested through the test client. Results are plain dicts ready for JSON.
+"""
+import math
+import random
+import time
+import tracemalloc
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.cache import caches
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from auths.models import User, Profile
+from task import search
+from task.models import Task, Category, Notification, DailyRegister, Progress, STATUS_CHOICES, PRIORITY_CHOICES
+from task.stats import rebuild_user_stats, rebuild_category_stats
+
+PASSWORD = 'bench12345'
+
+
+def isolated_settings():
+    """
+        Private in-process caches (one locmem per configured alias) and event broker:
+        the bench, and --cold-cache clearing them, never touch the caches and streams
+        shared with the running site.
+    """
+    return override_settings(
+        CACHES={
+            alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'bench-{alias}'}
+            for alias in settings.CACHES
+        },
+        EVENTS_BROKER='memory',
+    )
+
+
+def clear_caches():
+    for cache in caches.all():
+        cache.clear()
+
+
+def phone_of(index):
+    return f'+2449{index:08d}'
+
+
+def seed(users=50, tasks=200, categories=5, notifications=20, daily=0.2, batch_size=1000, rng=None):
+    """
+        Bulk insert the dataset: `users` users (with profile and phone), each with
+        `categories` categories, `tasks` tasks, `notifications` notifications and a
+        DailyRegister on a `daily` fraction of the tasks.
+        Derived state skipped by bulk_create (counters, progress, search) is rebuilt at the end.
+    """
+    rng = rng or random.Random(0)
+    password = make_password(PASSWORD)
+    created = User.objects.bulk_create([
+        User(username=f'bench{index}', email=f'bench{index}@example.com', password=password)
+        for index in range(users)
+    ], batch_size=batch_size)
+    Profile.objects.bulk_create([
+        Profile(user=user, phone_number=phone_of(index), phone_normalized=phone_of(index))
+        for index, user in enumerate(created)
+    ], batch_size=batch_size)
+    user_categories = {}
+    for user in created:
+        user_categories[user.pk] = Category.objects.bulk_create([
+            Category(name=f'Categoria {index}', user=user) for index in range(categories)
+        ])
+
+    today = timezone.localdate()
+    statuses = [value for value, label in STATUS_CHOICES]
+    priorities = [value for value, label in PRIORITY_CHOICES]
+    words = ['relatorio', 'reuniao', 'compras', 'estudo', 'projeto', 'treino', 'viagem', 'leitura']
+    for user in created:
+        rows = Task.objects.bulk_create([
+            Task(
+                user=user,
+                title=f'{rng.choice(words)} {index}',
+                description=' '.join(rng.choices(words, k=8)),
+                category=rng.choice(user_categories[user.pk]) if categories else None,
+                date_expired=today + timedelta(days=rng.randint(-30, 60)),
+                status=rng.choice(statuses),
+                priority=rng.choice(priorities),
+            )
+            for index in range(tasks)
+        ], batch_size=batch_size)
+        Progress.objects.bulk_create([Progress(task=task) for task in rows], batch_size=batch_size)
+        Notification.objects.bulk_create([
+            Notification(user=user, task=rng.choice(rows) if rows else None, message='Lembrete de tarefa')
+            for index in range(notifications)
+        ], batch_size=batch_size)
+        DailyRegister.objects.bulk_create([
+            DailyRegister(task=task, completed_per=user) for task in rows if rng.random() < daily
+        ], batch_size=batch_size)
+
+    user_ids = [user.pk for user in created]
+    rebuild_user_stats(user_ids)
+    rebuild_category_stats(Category.objects.filter(user_id__in=user_ids).values_list('id', flat=True))
+    search.index_all()
+    return created
+
+
+def percentile(values, fraction):
+    """ Nearest-rank percentile of a non empty list """
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def measure(name, request, iterations, before=None):
+    """
+        Call `request()` `iterations` times. Latency and query counts come from untraced
+        runs; peak memory from one extra run under tracemalloc (it slows Python down).
+    """
+    timings, queries = [], []
+    for index in range(iterations):
+        if before:
+            before()
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            response = request()
+            timings.append((time.perf_counter() - start) * 1000)
+        queries.append(len(captured))
+        if response.status_code >= 400:
+            raise RuntimeError(f'{name}: HTTP {response.status_code}')
+    if before:
+        before()
+    tracemalloc.start()
+    request()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        "iterations": iterations,
+        "p50_ms": round(percentile(timings, 0.50), 3),
+        "p95_ms": round(percentile(timings, 0.95), 3),
+        "p99_ms": round(percentile(timings, 0.99), 3),
+        "mean_ms": round(sum(timings) / len(timings), 3),
+        "queries_p50": percentile(queries, 0.50),
+        "queries_max": max(queries),
+        "peak_memory_kb": round(peak / 1024, 1),
+    }
+
+
+def run_benchmarks(users, iterations=50, cold_cache=False, rng=None):
+    """ Time every path for the seeded `users`; returns {path: stats}. Run it under isolated_settings() """
+    rng = rng or random.Random(1)
+    user = users[0]
+    client = Client()
+    client.force_login(user)
+    cache_clear = clear_caches if cold_cache else None
+    task_ids = list(Task.objects.filter(user=user).values_list('id', flat=True))
+    data = {'title': 'Benchmark', 'description': 'criada pelo bench', 'priority': 'MEDIA', 'status': 'PENDENTE'}
+
+    def create():
+        return client.post(reverse('task'), data)
+
+    def update():
+        return client.post(reverse('task_update', args=[rng.choice(task_ids)]), {**data, 'title': 'Atualizada'})
+
+    deletable = []
+
+    def prepare_delete():
+        if cache_clear:
+            cache_clear()
+        deletable.append(Task.objects.create(user=user, title='Para apagar').pk)
+
+    def delete():
+        return client.post(reverse('task_delete', args=[deletable.pop()]))
+
+    def login(identifier):
+        def request():
+            response = Client().post(reverse('login'), {'identifier': identifier, 'password': PASSWORD})
+            # Failed logins also redirect (back to the form)
+            if response.url != reverse('index'):
+                raise RuntimeError(f'login with {identifier} failed')
+            return response
+        return request
+
+    results = {}
+    results['dashboard'] = measure('dashboard', lambda: client.get(reverse('index')), iterations, cache_clear)
+    results['task_create'] = measure('task_create', create, iterations, cache_clear)
+    results['task_update'] = measure('task_update', update, iterations, cache_clear)
+    results['task_delete'] = measure('task_delete', delete, iterations, prepare_delete)
+    # Measure the authentication itself, not the throttle answering 429
+    with override_settings(LOGIN_THROTTLE_ENABLED=False):
+        results['login_email'] = measure('login_email', login(user.email), iterations, cache_clear)
+        results['login_phone'] = measure('login_phone', login(phone_of(0)), iterations, cache_clear)
+    results['progress_poll'] = measure(
+        'progress_poll', lambda: client.get(reverse('progress', args=[rng.choice(task_ids)])), iterations, cache_clear
+    )
+    return results
@@ -0,0 +1,174 @@
+import hashlib
+import pickle
+import threading
+import time
+from collections import Counter
+
+from cachetools import TTLCache
+from django.conf import settings
+from django.core.cache import caches
+
+from .db_router import pin_user
+
+
+def get_cache():
+    return caches[getattr(settings, 'DASHBOARD_CACHE', 'default')]
+
+
+def _version_key(user_id):
+    return f'dashboard:version:{user_id}'
+
+
+def _new_version():
+    # Start from the clock, not 1, so a version lost by eviction is never reused
+    # (dashboard ETags are built from it)
+    return time.time_ns() // 1000
+
+
+def get_dashboard_version(user_id):
+    """
+        Current version of the user's dashboard. Any cached fragment built with an
+        older version is simply never read again.
+    """
+    cache = get_cache()
+    version = cache.get(_version_key(user_id))
+    if version is None:
+        cache.add(_version_key(user_id), _new_version(), timeout=None)
+        version = cache.get(_version_key(user_id))
+    return version
+
+
+async def aget_dashboard_version(user_id):
+    cache = get_cache()
+    version = await cache.aget(_version_key(user_id))
+    if version is None:
+        await cache.aadd(_version_key(user_id), _new_version(), timeout=None)
+        version = await cache.aget(_version_key(user_id))
+    return version
+
+
+def bump_dashboard_version(user_id):
+    """
+        Invalidate every cached fragment of the user. The user is also pinned to the
+        primary for a moment, so the fragments rebuilt next are not read from a lagging replica.
+    """
+    if user_id is None:
+        return
+    pin_user(user_id)
+    cache = get_cache()
+    try:
+        cache.incr(_version_key(user_id))
+    except ValueError:
+        # Key does not exist yet (or was evicted): start a new version.
+        cache.set(_version_key(user_id), _new_version(), timeout=None)
+
+
+def dashboard_fragment(user_id, name, vary_on, builder):
+    """
+        Return the cached HTML of a dashboard fragment, building it with `builder()` on a miss.
+        `vary_on` distinguishes fragments of the same user (ex: querystring with filters/cursor).
+    """
+    cache = get_cache()
+    digest = hashlib.md5(str(vary_on).encode()).hexdigest()
+    key = f'dashboard:{user_id}:v{get_dashboard_version(user_id)}:{name}:{digest}'
+    html = cache.get(key)
+    if html is None:
+        html = builder()
+        cache.set(key, html, timeout=getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 300))
+    return html
+
+
+async def adashboard_fragment(user_id, name, vary_on, builder):
+    """ dashboard_fragment for async views: `builder` is a coroutine function """
+    cache = get_cache()
+    digest = hashlib.md5(str(vary_on).encode()).hexdigest()
+    key = f'dashboard:{user_id}:v{await aget_dashboard_version(user_id)}:{name}:{digest}'
+    html = await cache.aget(key)
+    if html is None:
+        html = await builder()
+        await cache.aset(key, html, timeout=getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 300))
+    return html
+
+
+_MISSING = object()
+
+
+class RepositoryCache:
+    """
+        Read-through cache of repository lookups in two tiers: an in-process LRU/TTL
+        (cachetools) in front of the shared Django cache (settings.REPOSITORY_CACHE).
+        
+        Keys are `repo:{namespace}:{key}` with settings.REPOSITORY_CACHE_VERSION as the
+        Django cache version, so changing the cached shape only needs a version bump.
+        Values are stored pickled: callers may modify what they get back.
+        Writes must call `invalidate`; the local tier of other processes expires
+        after settings.REPOSITORY_CACHE_LOCAL_TTL seconds. Namespaces that must never
+        serve a stale copy are created with `local=False` and only use the shared cache.
+    """
+    registry = {}
+    
+    def __init__(self, namespace, maxsize=1024, local=True):
+        self.namespace = namespace
+        self.maxsize = maxsize
+        self.use_local = local
+        self.stats = Counter()
+        self._lock = threading.Lock()
+        self._local = None
+        RepositoryCache.registry[namespace] = self
+    
+    @property
+    def local(self):
+        if self._local is None:
+            self._local = TTLCache(maxsize=self.maxsize, ttl=getattr(settings, 'REPOSITORY_CACHE_LOCAL_TTL', 5))
+        return self._local
+    
+    def get_shared(self):
+        return caches[getattr(settings, 'REPOSITORY_CACHE', 'default')]
+    
+    def make_key(self, key):
+        return f'repo:{self.namespace}:{key}'
+    
+    def get_or_load(self, key, loader):
+        """ Cached value of `key`, calling `loader()` on a miss. None results are not cached. """
+        key = self.make_key(key)
+        version = getattr(settings, 'REPOSITORY_CACHE_VERSION', 1)
+        data = _MISSING
+        if self.use_local:
+            with self._lock:
+                data = self.local.get(key, _MISSING)
+        if data is not _MISSING:
+            self.stats['local_hits'] += 1
+            return pickle.loads(data)
+        data = self.get_shared().get(key, version=version)
+        if data is not None:
+            self.stats['shared_hits'] += 1
+        else:
+            self.stats['misses'] += 1
+            value = loader()
+            if value is None:
+                return None
+            data = pickle.dumps(value)
+            self.get_shared().set(key, data, timeout=getattr(settings, 'REPOSITORY_CACHE_TIMEOUT', 300), version=version)
+        if self.use_local:
+            with self._lock:
+                self.local[key] = data
+        return pickle.loads(data)
+    
+    def invalidate(self, *keys):
+        keys = [self.make_key(key) for key in keys]
+        if not keys:
+            return
+        self.stats['invalidations'] += len(keys)
+        with self._lock:
+            for key in keys:
+                self.local.pop(key, None)
+        self.get_shared().delete_many(keys, version=getattr(settings, 'REPOSITORY_CACHE_VERSION', 1))
+    
+    def clear_local(self):
+        with self._lock:
+            self.local.clear()
+
+
+def get_repository_cache_stats():
+    """ Hit/miss counters of this process per namespace, ex: {'task': {'local_hits': 3, ...}} """
+    return {namespace: dict(cache.stats) for namespace, cache in RepositoryCache.registry.items()}
@@ -0,0 +1,127 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import sync_to_async, iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+
+REPLICA = 'replica'
+
+_replica_reads = ContextVar('replica_reads', default=False)
+# {'user_id', 'pinned', 'wrote'} of the current request, None outside a request
+_request_state = ContextVar('replica_request_state', default=None)
+
+
+def has_replica():
+    return REPLICA in settings.DATABASES
+
+
+def _pin_key(user_id):
+    return f'db:pinned:{user_id}'
+
+
+def pin_user(user_id):
+    """
+        Send the reads of every request of the user to the primary for settings.REPLICA_PIN_SECONDS.
+        Called on the user's own writes and whenever their dashboard version is bumped, so
+        a cache filled right after an invalidation never stores what a lagging replica returned.
+    """
+    if user_id is None or not has_replica():
+        return
+    caches[getattr(settings, 'REPLICA_PIN_CACHE', 'default')].set(
+        _pin_key(user_id), True, timeout=getattr(settings, 'REPLICA_PIN_SECONDS', 5),
+    )
+
+
+def is_user_pinned(user_id):
+    if user_id is None:
+        return False
+    return bool(caches[getattr(settings, 'REPLICA_PIN_CACHE', 'default')].get(_pin_key(user_id)))
+
+
+@contextmanager
+def replica_reads():
+    """
+        Send the reads inside the block (or decorated function) to the replica,
+        unless the request is pinned to the primary.
+    """
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+class ReplicaRouter:
+    """
+        Writes and ordinary reads go to 'default'. Reads made inside replica_reads()
+        go to 'replica' when it is configured, except after a write in the same
+        request or while the user is pinned (see pin_user): users always read their own writes.
+    """
+    def db_for_read(self, model, **hints):
+        if not _replica_reads.get() or not has_replica():
+            return None
+        state = _request_state.get()
+        if state is not None:
+            if state['pinned'] is None:
+                # Only looked up by requests that would read the replica
+                state['pinned'] = is_user_pinned(state['user_id'])
+            if state['pinned'] or state['wrote']:
+                return 'default'
+        return REPLICA
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        if state is not None:
+            state['wrote'] = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Same data on both aliases
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets the schema by replication (or by copying the sqlite file)
+        return db != REPLICA
+
+
+class ReplicaPinningMiddleware:
+    """
+        Route the reads of the request according to the user's pin (see pin_user) and pin
+        the user after a write, so the redirect that follows a POST does not read a lagging
+        replica, whichever session or device it comes from.
+        Must come after AuthenticationMiddleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        user = getattr(request, 'user', None)
+        state = {'user_id': user.pk if user is not None else None, 'pinned': None, 'wrote': False}
+        token = _request_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        if state['wrote']:
+            pin_user(state['user_id'])
+        return response
+
+    async def __acall__(self, request):
+        user = await request.auser() if hasattr(request, 'auser') else None
+        state = {'user_id': user.pk if user is not None else None, 'pinned': None, 'wrote': False}
+        token = _request_state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        if state['wrote']:
+            await sync_to_async(pin_user)(state['user_id'])
+        return response
@@ -0,0 +1,176 @@
+"""
+    Per-user event fan-out for the Server-Sent Events stream (task.views.EventStreamView).
+
+    `publish()` is called from sync code (signals, services) and only sends once the
+    transaction commits. Every open tab holds a subscription: a bounded asyncio queue
+    registered in the in-process broker. With several ASGI workers set
+    EVENTS_BROKER = 'redis': events then go through one Redis channel and each worker
+    delivers them to its own subscribers.
+"""
+import asyncio
+import json
+import logging
+import threading
+from contextlib import asynccontextmanager
+
+from django.conf import settings
+from django.db import transaction
+
+from .metrics import register, CounterMetric
+
+logger = logging.getLogger(__name__)
+
+events_published = register(CounterMetric('todo_events_published_total', 'Events sent to the SSE streams.'))
+
+
+class Subscription:
+    def __init__(self, user_id, loop, maxsize):
+        self.user_id = user_id
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.lagging = False
+
+    def put(self, message):
+        # Runs on the subscriber loop. A tab that does not read is dropping events,
+        # not growing memory: it gets a "refresh" once there is room again.
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.lagging = True
+
+    async def get(self, timeout=None):
+        """ Next message, or None if nothing arrived in `timeout` seconds """
+        if self.lagging and self.queue.empty():
+            self.lagging = False
+            return {"event": "refresh", "data": {}}
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class InProcessBroker:
+    """ Subscribers of this process, by user id. publish() may be called from any thread. """
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def publish(self, user_id, message):
+        self.deliver(user_id, message)
+
+    def deliver(self, user_id, message):
+        with self._lock:
+            subscriptions = list(self._subscribers.get(user_id, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, message)
+            except RuntimeError: # loop already closed
+                self._remove(subscription)
+
+    def _remove(self, subscription):
+        with self._lock:
+            subscriptions = self._subscribers.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscribers[subscription.user_id]
+
+    @asynccontextmanager
+    async def subscribe(self, user_id):
+        subscription = Subscription(user_id, asyncio.get_running_loop(), settings.EVENTS_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(subscription)
+        try:
+            yield subscription
+        finally:
+            self._remove(subscription)
+
+
+class RedisBroker(InProcessBroker):
+    """
+        Events are published on a Redis channel per user; one listener per process
+        (pattern subscription) hands them to the local subscribers.
+    """
+    def __init__(self, url, prefix='todo:events'):
+        super().__init__()
+        import redis
+        self.url = url
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+        self._listener = None
+
+    def publish(self, user_id, message):
+        self._client.publish(f'{self.prefix}:{user_id}', json.dumps(message, default=str))
+
+    async def _listen(self):
+        import redis.asyncio
+        while True:
+            client = redis.asyncio.Redis.from_url(self.url)
+            try:
+                async with client.pubsub() as pubsub:
+                    await pubsub.psubscribe(f'{self.prefix}:*')
+                    async for item in pubsub.listen():
+                        if item['type'] != 'pmessage':
+                            continue
+                        user_id = int(item['channel'].rsplit(b':', 1)[1])
+                        self.deliver(user_id, json.loads(item['data']))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception('Redis event listener failed, reconnecting')
+                await asyncio.sleep(1)
+            finally:
+                await client.aclose()
+
+    @asynccontextmanager
+    async def subscribe(self, user_id):
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.ensure_future(self._listen())
+        async with super().subscribe(user_id) as subscription:
+            yield subscription
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            if settings.EVENTS_BROKER == 'redis':
+                _broker = RedisBroker(settings.REDIS_URL)
+            else:
+                _broker = InProcessBroker()
+        return _broker
+
+
+def publish(user_id, event, data):
+    """ Send `event` to the open streams of the user after the current transaction commits """
+    if user_id is None:
+        return
+    message = {"event": event, "data": data}
+
+    def send():
+        events_published.inc(event=event)
+        try:
+            get_broker().publish(user_id, message)
+        except Exception:
+            # Streams are a convenience: never fail the write that triggered the event
+            logger.exception('Could not publish %s event', event)
+
+    transaction.on_commit(send)
+
+
+def format_event(message):
+    data = json.dumps(message["data"], default=str, ensure_ascii=False)
+    return f'event: {message["event"]}\ndata: {data}\n\n'
+
+
+async def event_stream(user_id):
+    """ Body of the text/event-stream response: events of the user plus periodic keepalive comments """
+    yield f'retry: {settings.EVENTS_RETRY_MS}\n\n'
+    async with get_broker().subscribe(user_id) as subscription:
+        while True:
+            message = await subscription.get(timeout=settings.EVENTS_KEEPALIVE)
+            yield format_event(message) if message is not None else ': keepalive\n\n'
@@ -0,0 +1,124 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.utils import timezone
+
+from .models import OutboxEmail
+
+
+def queue_mail(subject, message, from_email, recipient_list, html_message=None):
+    """
+        Same signature as django.core.mail.send_mail, but only stores the message
+        in the outbox. Nothing leaves the request except one INSERT.
+    """
+    return OutboxEmail.objects.create(
+        subject=subject,
+        body=message,
+        html_body=html_message,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        recipients=list(recipient_list),
+    )
+
+
+def _build_message(outbox, connection):
+    message = EmailMultiAlternatives(
+        subject=outbox.subject,
+        body=outbox.body,
+        from_email=outbox.from_email,
+        to=outbox.recipients,
+        connection=connection,
+    )
+    if outbox.html_body:
+        message.attach_alternative(outbox.html_body, 'text/html')
+    return message
+
+
+def _claim(outbox, seconds):
+    """
+        Lease the message to this worker with a conditional UPDATE: it only matches while
+        the row is still due as we read it, so concurrent workers never send it twice.
+        If the worker dies the lease runs out and the message is due again.
+    """
+    lease = timezone.now() + timedelta(seconds=seconds)
+    claimed = OutboxEmail.objects.filter(
+        pk=outbox.pk, status='PENDENTE', next_attempt=outbox.next_attempt,
+    ).update(next_attempt=lease)
+    if claimed:
+        outbox.next_attempt = lease
+    return bool(claimed)
+
+
+def _open_connection():
+    connection = get_connection(fail_silently=False)
+    connection.open()
+    return connection
+
+
+def send_queued_mail(batch_size=50, max_attempts=None, retry_delay=None, claim_seconds=None):
+    """
+        Deliver due messages of the outbox in batches over one reused connection.
+
+        The connection is only opened once there is a message to send. A failed message
+        is retried later with exponential backoff (retry_delay * 2 ** attempts seconds)
+        until `max_attempts`, then marked as FALHOU. Errors opening the connection are
+        raised after the claimed message is handed back.
+        Returns a tuple (sent, failed).
+    """
+    max_attempts = max_attempts or getattr(settings, 'EMAIL_OUTBOX_MAX_ATTEMPTS', 5)
+    retry_delay = retry_delay or getattr(settings, 'EMAIL_OUTBOX_RETRY_DELAY', 60)
+    claim_seconds = claim_seconds or getattr(settings, 'EMAIL_OUTBOX_CLAIM_SECONDS', 300)
+    sent = failed = 0
+    last_id = 0
+
+    connection = None
+    try:
+        while True:
+            batch = list(
+                OutboxEmail.objects
+                .filter(status='PENDENTE', next_attempt__lte=timezone.now(), id__gt=last_id)
+                .order_by('id')[:batch_size]
+            )
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            claimed = []
+            try:
+                for outbox in batch:
+                    due = outbox.next_attempt
+                    if not _claim(outbox, claim_seconds):
+                        continue # taken by another worker
+                    if connection is None:
+                        try:
+                            connection = _open_connection()
+                        except Exception:
+                            outbox.next_attempt = due
+                            OutboxEmail.objects.filter(pk=outbox.pk).update(next_attempt=due)
+                            raise
+                    claimed.append(outbox)
+                    try:
+                        connection.send_messages([_build_message(outbox, connection)])
+                    except Exception as e:
+                        failed += 1
+                        outbox.attempts += 1
+                        outbox.last_error = str(e)
+                        if outbox.attempts >= max_attempts:
+                            outbox.status = 'FALHOU'
+                        else:
+                            outbox.next_attempt = timezone.now() + timedelta(seconds=retry_delay * 2 ** outbox.attempts)
+                        # The server may have dropped us: the next message opens a fresh connection
+                        connection.close()
+                        connection = None
+                    else:
+                        sent += 1
+                        outbox.status = 'ENVIADO'
+                        outbox.attempts += 1
+                        outbox.date_sent = timezone.now()
+            finally:
+                # Record what was delivered even if the connection can not be reopened
+                OutboxEmail.objects.bulk_update(claimed, ['status', 'attempts', 'next_attempt', 'last_error', 'date_sent'])
+    finally:
+        if connection is not None:
+            connection.close()
+    return sent, failed
@@ -0,0 +1,76 @@
+import json
+import platform
+import random
+import subprocess
+import time
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+
+from core.bench import seed, run_benchmarks, isolated_settings
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = "Seed a throwaway test database and report latency percentiles, query counts and peak memory of the main paths as JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50, help='Users seeded.')
+        parser.add_argument('--tasks', type=int, default=200, help='Tasks per user.')
+        parser.add_argument('--categories', type=int, default=5, help='Categories per user.')
+        parser.add_argument('--notifications', type=int, default=20, help='Notifications per user.')
+        parser.add_argument('--daily', type=float, default=0.2, help='Fraction of tasks with a daily register.')
+        parser.add_argument('--iterations', type=int, default=50, help='Requests timed per path.')
+        parser.add_argument('--cold-cache', action='store_true', help='Clear the cache before every request.')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed of the dataset.')
+        parser.add_argument('--output', help='Write the JSON to this file instead of stdout.')
+
+    def handle(self, *args, **options):
+        # Same isolation as the test runner: nothing touches the real database, caches or sends email
+        setup_test_environment()
+        isolation = isolated_settings()
+        isolation.enable()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            started = time.perf_counter()
+            users = seed(
+                users=options['users'], tasks=options['tasks'], categories=options['categories'],
+                notifications=options['notifications'], daily=options['daily'], rng=random.Random(options['seed']),
+            )
+            seed_seconds = time.perf_counter() - started
+            results = run_benchmarks(users, iterations=options['iterations'], cold_cache=options['cold_cache'])
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            isolation.disable()
+            teardown_test_environment()
+
+        report = {
+            "revision": git_revision(),
+            "environment": {
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "database": connection.vendor,
+            },
+            "dataset": {name: options[name] for name in ('users', 'tasks', 'categories', 'notifications', 'daily', 'seed')},
+            "seed_seconds": round(seed_seconds, 3),
+            "cold_cache": options['cold_cache'],
+            "results": results,
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output + '\n')
+            self.stderr.write(f"Results written to {options['output']}")
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.assets import build_static
+
+
+class Command(BaseCommand):
+    help = "Build STATIC_ROOT for production: hashed file names, staticfiles.json manifest and gzip/brotli copies."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--no-clear', action='store_true', help='Keep files already in STATIC_ROOT.')
+
+    def handle(self, *args, **options):
+        files = build_static(clear=not options['no_clear'], verbosity=max(options['verbosity'] - 1, 0))
+        for item in files:
+            compressed = ', '.join(
+                f'{encoding} {item[encoding]}' for encoding in ('gzip', 'brotli') if item[encoding] is not None
+            )
+            self.stdout.write(f"{item['name']} -> {item['hashed']} ({item['bytes']} bytes{', ' + compressed if compressed else ''})")
+        self.stdout.write(self.style.SUCCESS(f'Manifest written to {settings.STATIC_ROOT / "staticfiles.json"}'))
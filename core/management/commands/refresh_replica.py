@@ -0,0 +1,25 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.db_router import REPLICA
+
+
+class Command(BaseCommand):
+    help = "Copy the primary SQLite database over the replica file (local stand-in for replication)."
+
+    def handle(self, *args, **options):
+        databases = settings.DATABASES
+        if REPLICA not in databases:
+            raise CommandError('No replica configured: set DATABASE_REPLICA.')
+        if not all(databases[alias]['ENGINE'].endswith('sqlite3') for alias in ('default', REPLICA)):
+            raise CommandError('Only SQLite files can be copied; real replicas are fed by the database server.')
+        source = sqlite3.connect(databases['default']['NAME'])
+        target = sqlite3.connect(databases[REPLICA]['NAME'])
+        try:
+            source.backup(target)
+        finally:
+            source.close()
+            target.close()
+        self.stdout.write(f"Replica {databases[REPLICA]['NAME']} refreshed from {databases['default']['NAME']}")
@@ -0,0 +1,39 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.mail import send_queued_mail
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Deliver the emails queued in the outbox over a single SMTP connection."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50, help='Messages loaded per query.')
+        parser.add_argument('--loop', action='store_true', help='Keep draining the outbox forever.')
+        parser.add_argument('--interval', type=float, default=10, help='Seconds to wait between runs with --loop.')
+        parser.add_argument('--max-backoff', type=float, default=300, help='Longest wait after the SMTP server can not be reached.')
+
+    def handle(self, *args, **options):
+        errors = 0
+        while True:
+            try:
+                sent, failed = send_queued_mail(batch_size=options['batch_size'])
+            except Exception:
+                if not options['loop']:
+                    raise
+                # SMTP server down or refusing us: wait longer each time instead of hammering it
+                errors += 1
+                wait = min(options['interval'] * 2 ** errors, options['max_backoff'])
+                logger.exception('Could not deliver the outbox, retrying in %s seconds', wait)
+                time.sleep(wait)
+                continue
+            errors = 0
+            if sent or failed or not options['loop']:
+                self.stdout.write(f'{sent} sent, {failed} failed')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,91 @@
+"""
+    In-process metrics rendered in the Prometheus text format by core.views.MetricsView.
+
+    Each worker process keeps its own registry: scrape every worker (or run a single
+    one behind the scraper) to get the whole picture.
+"""
+import threading
+from bisect import bisect_left
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+
+class Histogram:
+    """ Prometheus histogram with one series per `view` label """
+    def __init__(self, name, help, buckets=SECONDS_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label, value):
+        with self._lock:
+            series = self._series.get(label)
+            if series is None:
+                series = self._series[label] = {'counts': [0] * (len(self.buckets) + 1), 'sum': 0.0, 'count': 0}
+            series['counts'][bisect_left(self.buckets, value)] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for label, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip((*self.buckets, '+Inf'), series['counts']):
+                    cumulative += count
+                    lines.append(f'{self.name}_bucket{{view="{label}",le="{bound}"}} {cumulative}')
+                lines.append(f'{self.name}_sum{{view="{label}"}} {series["sum"]:.6f}')
+                lines.append(f'{self.name}_count{{view="{label}"}} {series["count"]}')
+        return lines
+
+
+class CounterMetric:
+    """ Prometheus counter with arbitrary labels """
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                labels = ','.join(f'{name}="{label}"' for name, label in key)
+                lines.append(f'{self.name}{{{labels}}} {value}' if labels else f'{self.name} {value}')
+        return lines
+
+
+request_duration = Histogram('todo_request_duration_seconds', 'Time spent in the view and inner middleware.')
+request_db_duration = Histogram('todo_request_db_seconds', 'Time spent running SQL per request.')
+request_template_duration = Histogram('todo_request_template_seconds', 'Time spent rendering templates per request.')
+request_queries = Histogram('todo_request_queries', 'SQL queries per request.', buckets=QUERY_BUCKETS)
+
+REGISTRY = [request_duration, request_db_duration, request_template_duration, request_queries]
+
+
+def register(metric):
+    REGISTRY.append(metric)
+    return metric
+
+
+def render_metrics():
+    """ Every registered metric, plus the repository cache counters, in the Prometheus text format """
+    from .cache import get_repository_cache_stats
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    lines.append('# HELP todo_repository_cache_events_total Repository cache hits, misses and invalidations.')
+    lines.append('# TYPE todo_repository_cache_events_total counter')
+    for namespace, stats in sorted(get_repository_cache_stats().items()):
+        for event, value in sorted(stats.items()):
+            lines.append(f'todo_repository_cache_events_total{{namespace="{namespace}",event="{event}"}} {value}')
+    return '\n'.join(lines) + '\n'
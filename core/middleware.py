@@ -0,0 +1,151 @@
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import DjangoTemplates, Template as DjangoTemplate
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from . import metrics
+
+# Timings of the current request, None outside RequestTimingMiddleware
+_timings = ContextVar('request_timings', default=None)
+
+
+class TimedTemplate(DjangoTemplate):
+    def render(self, context=None, request=None):
+        timings = _timings.get()
+        if timings is None or timings['depth']:
+            return super().render(context, request)
+        # Only the outermost render is counted (fragments rendered inside it are part of it)
+        timings['depth'] += 1
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            timings['template'] += time.perf_counter() - start
+            timings['depth'] -= 1
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """
+        DjangoTemplates backend (settings.TEMPLATES) whose templates add their render
+        time to the request timings. Outside RequestTimingMiddleware it only costs a ContextVar lookup.
+    """
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
+
+
+def _timed_execute(execute, sql, params, many, context):
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings = _timings.get()
+        if timings is not None:
+            timings['db'] += time.perf_counter() - start
+            timings['queries'] += 1
+
+
+def _install_wrapper(connection, **kwargs):
+    # Every connection of every thread (sync_to_async workers included) gets the wrapper;
+    # the ContextVar above tells it which request, if any, the query belongs to.
+    if _timed_execute not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_timed_execute)
+
+
+class RequestTimingMiddleware:
+    """
+        Time spent in SQL (and number of queries), template rendering and the view,
+        sent back in a Server-Timing header and aggregated per URL name for /metrics.
+
+        Enabled with settings.REQUEST_METRICS_ENABLED; otherwise Django drops it at
+        startup and requests pay nothing. Put it first in MIDDLEWARE. Template time is
+        only measured for the TimedDjangoTemplates backend.
+    """
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_METRICS_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        connection_created.connect(_install_wrapper, dispatch_uid='request_timing')
+        for connection in connections.all(initialized_only=True):
+            _install_wrapper(connection)
+
+    sync_capable = True
+    async_capable = True
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings, token, start = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _timings.reset(token)
+        return self.finish(request, response, timings, start)
+
+    async def __acall__(self, request):
+        timings, token, start = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _timings.reset(token)
+        return self.finish(request, response, timings, start)
+
+    def start(self):
+        timings = {'db': 0.0, 'queries': 0, 'template': 0.0, 'depth': 0}
+        return timings, _timings.set(timings), time.perf_counter()
+
+    def finish(self, request, response, timings, start):
+        view = time.perf_counter() - start
+
+        match = getattr(request, 'resolver_match', None)
+        name = (match.view_name if match else None) or 'unmatched'
+        metrics.request_duration.observe(name, view)
+        metrics.request_db_duration.observe(name, timings['db'])
+        metrics.request_template_duration.observe(name, timings['template'])
+        metrics.request_queries.observe(name, timings['queries'])
+
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={timings["db"] * 1000:.1f};desc="{timings["queries"]} queries"',
+            f'tpl;dur={timings["template"] * 1000:.1f}',
+            f'view;dur={view * 1000:.1f}',
+        ])
+        return response
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """
+        WhiteNoiseMiddleware that can also run in an async middleware chain, so ASGI
+        requests are not handed to a thread just to pass through it. Static files
+        themselves are still served from a thread (file opening is blocking).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
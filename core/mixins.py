@@ -0,0 +1,18 @@
+from django.contrib.auth.mixins import LoginRequiredMixin
+
+
+class AsyncLoginRequiredMixin(LoginRequiredMixin):
+    """
+        LoginRequiredMixin for views with async handlers. The user is loaded with
+        request.auser() and stored on request.user, so templates and sync helpers
+        can read it afterwards without touching the database.
+    """
+    def dispatch(self, request, *args, **kwargs):
+        return self._adispatch(request, *args, **kwargs)
+
+    async def _adispatch(self, request, *args, **kwargs):
+        request.user = await request.auser()
+        if not request.user.is_authenticated:
+            return self.handle_no_permission()
+        # Skip LoginRequiredMixin.dispatch: it would check request.user again
+        return await super(LoginRequiredMixin, self).dispatch(request, *args, **kwargs)
@@ -1 +1,117 @@
-from django.db import models
\ No newline at end of file
+import copy
+
+from django.db import models
+from django.utils import timezone
+
+OUTBOX_STATUS_CHOICES = [
+    ('PENDENTE', 'Pendente'),
+    ('ENVIADO', 'Enviado'),
+    ('FALHOU', 'Falhou'),
+]
+
+
+class DirtyFieldsMixin:
+    """
+        Remember the field values of an instance as loaded from (or last written to) the
+        database. save() of a loaded instance then only UPDATEs the changed fields
+        (plus auto_now ones) and is skipped entirely, with its pre/post_save signals,
+        when nothing changed. New instances and instances built by hand save as usual.
+    """
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.snapshot_fields()
+        return instance
+
+    def snapshot_fields(self):
+        """ Take the current values as the stored ones (ex: after a bulk_update) """
+        deferred = self.get_deferred_fields()
+        self._loaded_values = {
+            field.attname: copy.deepcopy(getattr(self, field.attname)) # JSON fields are mutable
+            for field in self._meta.concrete_fields if field.attname not in deferred
+        }
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        # The refreshed values are the stored ones now: a save back to the old value must be written
+        if fields is None or not hasattr(self, '_loaded_values'):
+            self.snapshot_fields()
+            return
+        fields = set(fields)
+        for field in self._meta.concrete_fields:
+            if field.name in fields or field.attname in fields:
+                self._loaded_values[field.attname] = copy.deepcopy(getattr(self, field.attname))
+
+    def get_loaded_value(self, attname, default=None):
+        return getattr(self, '_loaded_values', {}).get(attname, default)
+
+    def get_dirty_fields(self):
+        """ Names of the fields whose value differs from the stored one """
+        loaded = getattr(self, '_loaded_values', {})
+        deferred = self.get_deferred_fields()
+        return {
+            field.name for field in self._meta.concrete_fields
+            if not field.primary_key and field.attname not in deferred
+            # A field deferred at load time and assigned since then is always written
+            and (field.attname not in loaded or getattr(self, field.attname) != loaded[field.attname])
+        }
+
+    def get_update_fields(self, update_fields=None, force_insert=False):
+        """
+            update_fields for save(): None to write every field (new or untracked instances),
+            an empty set when nothing changed and the save can be skipped.
+        """
+        tracked = (
+            hasattr(self, '_loaded_values') and not self._state.adding
+            and self.pk == self._loaded_values.get(self._meta.pk.attname)
+        )
+        if not tracked or force_insert:
+            return update_fields
+        dirty = self.get_dirty_fields()
+        if update_fields is not None:
+            dirty &= {self._meta.get_field(name).name for name in update_fields}
+        if not dirty:
+            return set()
+        auto_now = {field.name for field in self._meta.concrete_fields if getattr(field, 'auto_now', False)}
+        return dirty | auto_now
+
+    def is_unchanged(self, update_fields=None, force_insert=False, **kwargs):
+        """ save() would not write anything: lets overrides skip their own work (ex: a transaction) """
+        update_fields = self.get_update_fields(update_fields, force_insert)
+        return update_fields is not None and not update_fields
+
+    def save(self, *args, **kwargs):
+        update_fields = self.get_update_fields(kwargs.get('update_fields'), kwargs.get('force_insert', False))
+        if update_fields is not None and not update_fields:
+            return
+        kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
+        self.snapshot_fields()
+
+
+class OutboxEmail(models.Model):
+    """
+        Email queued during a request and delivered later by `manage.py send_queued_mail`.
+    """
+    subject = models.CharField(max_length=255)
+    body = models.TextField(blank=True)
+    html_body = models.TextField(blank=True, null=True)
+    from_email = models.CharField(max_length=255)
+    recipients = models.JSONField(default=list) # Ex: ["user@mail.com"]
+    status = models.CharField(max_length=10, choices=OUTBOX_STATUS_CHOICES, default='PENDENTE')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, null=True)
+    date_creation = models.DateTimeField(auto_now_add=True)
+    date_sent = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'outbox_email'
+        verbose_name = 'Outbox Email'
+        verbose_name_plural = 'Outbox Emails'
+        indexes = [ # worker only scans due pending messages
+            models.Index(fields=['status', 'next_attempt']),
+        ]
+    
+    def __str__(self):
+        return f'{self.status}: {self.subject}'
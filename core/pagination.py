@@ -0,0 +1,119 @@
+import base64
+import json
+from datetime import datetime
+
+from django.db.models import Q
+
+
+def encode_cursor(value, pk):
+    """
+        Build an opaque cursor from the (value, id) pair of the last row of a page.
+    """
+    raw = f"{value.isoformat()}|{pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """
+        Return the (datetime, id) pair stored in a cursor, or None when the cursor is invalid.
+    """
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        value, pk = raw.rsplit('|', 1)
+        return datetime.fromisoformat(value), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def encode_positions(positions, issued):
+    """
+        Cursor holding one (datetime, id) position per stream, ex: {'tasks': (date, 12), ...},
+        and the time it was issued at.
+    """
+    raw = json.dumps({
+        "issued": issued.isoformat(),
+        "positions": {name: [value.isoformat(), pk] for name, (value, pk) in positions.items() if value},
+    })
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_positions(token):
+    """
+        Inverse of encode_positions: (positions, issued). An empty cursor means
+        "from the beginning": ({}, None); so does an invalid one (anything not written
+        by encode_positions, ex: naive datetimes), which SyncView turns into a reset.
+    """
+    if not token:
+        return {}, None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        raw = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        positions = {
+            str(name): (_aware(datetime.fromisoformat(value)), int(pk))
+            for name, (value, pk) in raw["positions"].items()
+        }
+        return positions, _aware(datetime.fromisoformat(raw["issued"]))
+    except (ValueError, TypeError, KeyError, AttributeError, UnicodeDecodeError):
+        return {}, None
+
+
+def _aware(value):
+    # Cursors are always written with aware datetimes
+    if value.tzinfo is None:
+        raise ValueError('naive datetime in cursor')
+    return value
+
+
+def after_position(queryset, field, position):
+    """ Rows strictly after (value, id) in ascending (field, id) order """
+    queryset = queryset.order_by(field, 'id')
+    if position:
+        value, pk = position
+        queryset = queryset.filter(Q(**{f'{field}__gt': value}) | Q(**{field: value, 'id__gt': pk}))
+    return queryset
+
+
+def keyset_queryset(queryset, field, cursor=None, descending=True):
+    """ Queryset ordered by (field, id) and filtered to the rows after `cursor` """
+    if descending:
+        queryset = queryset.order_by(f'-{field}', '-id')
+    else:
+        queryset = queryset.order_by(field, 'id')
+
+    position = decode_cursor(cursor)
+    if position:
+        value, pk = position
+        if descending:
+            queryset = queryset.filter(Q(**{f'{field}__lt': value}) | Q(**{field: value, 'id__lt': pk}))
+        else:
+            queryset = queryset.filter(Q(**{f'{field}__gt': value}) | Q(**{field: value, 'id__gt': pk}))
+    return queryset
+
+
+def _split_page(rows, field, limit):
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, field), last.pk)
+    return rows, next_cursor
+
+
+def keyset_page(queryset, field, cursor=None, limit=20, descending=True):
+    """
+        Slice a queryset by keyset on (field, id) instead of OFFSET.
+
+        Returns (rows, next_cursor). The cost of a page does not depend on how deep
+        the client is in the listing, only on `limit`.
+    """
+    queryset = keyset_queryset(queryset, field, cursor, descending)
+    return _split_page(list(queryset[:limit + 1]), field, limit)
+
+
+async def akeyset_page(queryset, field, cursor=None, limit=20, descending=True):
+    """ keyset_page for async views (async ORM iteration) """
+    queryset = keyset_queryset(queryset, field, cursor, descending)
+    return _split_page([row async for row in queryset[:limit + 1]], field, limit)
@@ -1,3 +1,424 @@
-from django.test import TestCase
+import asyncio
+import contextvars
+import importlib.util
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import types
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core import mail
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.mail.backends.locmem import EmailBackend
+from django.db import connection, connections, router
+from django.db.models.signals import post_save
+from django.http import HttpResponse
+from django.template import engines
+from django.template.backends.django import Template as DjangoTemplate
+from django.test import TestCase, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from auths.models import User, Profile
+from task.models import Task, Notification
+from task.stats import get_user_status_counts, rebuild_user_stats
+from .assets import build_static, check_manifest
+from .bench import isolated_settings, clear_caches
+from .cache import bump_dashboard_version
+from .events import InProcessBroker, RedisBroker, event_stream
+from .db_router import ReplicaPinningMiddleware, replica_reads
+from .mail import queue_mail, send_queued_mail, _claim
+from .middleware import RequestTimingMiddleware, TimedTemplate
+from .models import OutboxEmail
+from .throttle import SlidingWindow
+
+
+class FlakyBackend(EmailBackend):
+    """ locmem backend that refuses messages to falha@mail.com """
+    opened = 0
+
+    def open(self):
+        FlakyBackend.opened += 1
+        return super().open()
+
+    def send_messages(self, messages):
+        if any('falha@mail.com' in message.to for message in messages):
+            raise ConnectionError('recusado')
+        return super().send_messages(messages)
+
+
+class DownBackend(EmailBackend):
+    def open(self):
+        raise ConnectionRefusedError('smtp fora do ar')
+
+
+class DashboardRevalidationTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.user = User.objects.create_user(username='painel', email='painel@mail.com', password='senha12345')
+        self.client.force_login(self.user)
+        # The CSRF cookie of the create form is part of the validator: get it first
+        self.client.get(reverse('index'))
+
+    def test_unchanged_dashboard_is_not_modified(self):
+        etag = self.client.get(reverse('index'))['ETag']
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(reverse('index'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse([query for query in captured if '"task"' in query['sql']])
+        # Other filters are another page
+        self.assertEqual(self.client.get(reverse('index') + '?order=urgency', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_task_write_changes_the_etag(self):
+        etag = self.client.get(reverse('index'))['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Task.objects.create(title='Nova tarefa', user=self.user)
+        response = self.client.get(reverse('index'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertContains(response, 'Nova tarefa')
+
+
+class StaticBuildTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = directory.name
+
+    def test_build_writes_hashed_compressed_files_and_manifest(self):
+        with override_settings(STATIC_ROOT=self.root, STATIC_MANIFEST=True):
+            with self.assertRaises(ImproperlyConfigured):
+                check_manifest()
+            files = build_static()
+            check_manifest()
+        self.assertTrue(os.path.exists(os.path.join(self.root, 'staticfiles.json')))
+        self.assertTrue(files)
+        brotli = importlib.util.find_spec('brotli') is not None
+        for item in files:
+            path = os.path.join(self.root, item['hashed'])
+            self.assertNotEqual(item['hashed'], item['name'])
+            self.assertTrue(os.path.exists(path))
+            self.assertEqual(item['bytes'], os.path.getsize(path))
+            if item['name'].endswith(('.css', '.js')):
+                # Only written when compression saves space: text assets always do
+                self.assertTrue(os.path.exists(path + '.gz'))
+                self.assertEqual(os.path.exists(path + '.br'), brotli)
+
+    def test_unhashed_static_needs_no_build(self):
+        with override_settings(STATIC_ROOT=self.root, STATIC_MANIFEST=False):
+            check_manifest()
+
+
+class RequestTimingMiddlewareTests(TestCase):
+    @override_settings(REQUEST_METRICS_ENABLED=True)
+    def test_queries_of_other_threads_are_counted(self):
+        def query():
+            try:
+                list(User.objects.all())
+            finally:
+                connections.close_all()
+
+        def view(request):
+            # Like sync_to_async: another thread, same context
+            thread = threading.Thread(target=contextvars.copy_context().run, args=(query,))
+            thread.start()
+            thread.join()
+            return HttpResponse()
+
+        response = RequestTimingMiddleware(view)(RequestFactory().get('/'))
+        self.assertIn('desc="1 queries"', response['Server-Timing'])
+
+    @override_settings(REQUEST_METRICS_ENABLED=True)
+    def test_template_time_is_measured_by_the_backend(self):
+        render = DjangoTemplate.render
+        template = engines['django'].from_string('{% for item in items %}{{ item }}{% endfor %}')
+        view = lambda request: HttpResponse(template.render({'items': range(20000)}, request))
+        response = RequestTimingMiddleware(view)(RequestFactory().get('/'))
+        self.assertGreater(float(re.search(r'tpl;dur=([\d.]+)', response['Server-Timing'])[1]), 0)
+        # Django's own template class is left alone
+        self.assertIsInstance(template, TimedTemplate)
+        self.assertIs(DjangoTemplate.render, render)
+
+
+@override_settings(EMAIL_BACKEND='core.tests.FlakyBackend')
+class OutboxTests(TestCase):
+    def setUp(self):
+        FlakyBackend.opened = 0
+
+    def queue(self, to='user@mail.com'):
+        return queue_mail('Assunto', 'Corpo', None, [to])
+
+    def test_due_messages_are_sent_once(self):
+        self.queue()
+        later = self.queue()
+        OutboxEmail.objects.filter(pk=later.pk).update(next_attempt=timezone.now() + timedelta(hours=1))
+        self.assertEqual(send_queued_mail(), (1, 0))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(send_queued_mail(), (0, 0))
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_connection_is_only_opened_with_due_messages(self):
+        send_queued_mail()
+        self.assertEqual(FlakyBackend.opened, 0)
+
+    def test_failures_back_off_then_give_up(self):
+        outbox = self.queue('falha@mail.com')
+        self.queue()
+        self.assertEqual(send_queued_mail(retry_delay=1), (1, 1))
+        outbox.refresh_from_db()
+        self.assertEqual((outbox.status, outbox.attempts, outbox.last_error), ('PENDENTE', 1, 'recusado'))
+        self.assertGreater(outbox.next_attempt, timezone.now())
+
+        OutboxEmail.objects.filter(pk=outbox.pk).update(attempts=4, next_attempt=timezone.now())
+        self.assertEqual(send_queued_mail(max_attempts=5), (0, 1))
+        outbox.refresh_from_db()
+        self.assertEqual(outbox.status, 'FALHOU')
+
+    def test_message_taken_by_another_worker_is_skipped(self):
+        outbox = self.queue()
+        stale = OutboxEmail.objects.get(pk=outbox.pk)
+        self.assertTrue(_claim(outbox, 300))
+        self.assertFalse(_claim(stale, 300))
+
+    @override_settings(EMAIL_BACKEND='core.tests.DownBackend')
+    def test_unreachable_server_hands_the_message_back(self):
+        outbox = self.queue()
+        with self.assertRaises(ConnectionRefusedError):
+            send_queued_mail()
+        reloaded = OutboxEmail.objects.get(pk=outbox.pk)
+        self.assertEqual((reloaded.status, reloaded.attempts), ('PENDENTE', 0))
+        self.assertEqual(reloaded.next_attempt, outbox.next_attempt)
+
+
+@mock.patch('core.db_router.has_replica', return_value=True)
+class ReplicaRouterTests(TestCase):
+    """ Routing decisions with a replica configured (tests run with it mirrored to 'default') """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='replica', email='replica@mail.com', password='senha12345')
+        self.other = User.objects.create_user(username='outro', email='outro@mail.com', password='senha12345')
+        caches['default'].clear() # pins left by the set up and other tests
+
+    def read_alias(self, user, write=False):
+        def view(request):
+            if write:
+                Task.objects.create(title='Escrita', user=user)
+            with replica_reads():
+                return HttpResponse(router.db_for_read(Task))
+        request = RequestFactory().get('/')
+        request.user = user
+        return ReplicaPinningMiddleware(view)(request).content.decode()
+
+    def test_only_replica_reads_leave_the_primary(self, has_replica):
+        self.assertEqual(router.db_for_read(Task), 'default')
+        with replica_reads():
+            self.assertEqual(router.db_for_read(Task), 'replica')
+        self.assertEqual(self.read_alias(self.user), 'replica')
+
+    def test_reads_after_a_write_stay_on_the_primary(self, has_replica):
+        self.assertEqual(self.read_alias(self.user, write=True), 'default')
+        # Next request of the same user, from any session
+        self.assertEqual(self.read_alias(self.user), 'default')
+        self.assertEqual(self.read_alias(self.other), 'replica')
+
+    def test_cache_invalidation_pins_the_user(self, has_replica):
+        # Ex: the nightly sweep concluded a task of the user: the dashboard is rebuilt from the primary
+        bump_dashboard_version(self.user.pk)
+        self.assertEqual(self.read_alias(self.user), 'default')
+        self.assertEqual(self.read_alias(self.other), 'replica')
+
+
+class BenchTests(TestCase):
+    def test_cold_cache_does_not_clear_the_site_caches(self):
+        caches['default'].set('bench:fora', 1)
+        with isolated_settings():
+            caches['default'].set('bench:dentro', 1)
+            clear_caches()
+            self.assertIsNone(caches['default'].get('bench:dentro'))
+        self.assertEqual(caches['default'].get('bench:fora'), 1)
+
+
+class LoginThrottleTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+
+    def test_window_allows_capacity_per_period(self):
+        window = SlidingWindow('teste', 3, 60)
+        now = 6000.0 # start of a window
+        self.assertEqual([window.consume('ip', now) for _ in range(3)], [0, 0, 0])
+        self.assertGreater(window.consume('ip', now), 0)
+        # Halfway through the next window half of the old attempts still count: 1.5 + 1
+        self.assertEqual(window.consume('ip', now + 90), 0)
+        self.assertGreater(window.consume('ip', now + 90), 0)
+        self.assertEqual(window.consume('ip', now + 121), 0)
+
+    def test_concurrent_attempts_are_all_counted(self):
+        window = SlidingWindow('concorrente', 5, 60)
+        results = []
+
+        def attempt():
+            results.append(window.consume('ip', 6000.0))
+
+        threads = [threading.Thread(target=attempt) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results.count(0), 5)
+
+    @override_settings(LOGIN_THROTTLE_ENABLED=True, LOGIN_THROTTLE_RATES={'ip': (30, 60), 'identifier': (2, 300)})
+    def test_login_is_refused_after_too_many_attempts(self):
+        data = {'identifier': 'Alguem@mail.com', 'password': 'errada123'}
+        for _ in range(2):
+            self.assertEqual(self.client.post(reverse('login'), data).status_code, 302)
+        # Another spelling of the same email shares the window
+        response = self.client.post(reverse('login'), {**data, 'identifier': 'alguem@MAIL.com'})
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+
+
+class DirtyFieldsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='sujo', email='sujo@mail.com', password='senha12345')
+        self.task = Task.objects.create(title='Limpa', user=self.user)
+
+    def test_unchanged_instance_is_not_written(self):
+        saved = []
+        receiver = lambda sender, instance, **kwargs: saved.append(instance.pk)
+        post_save.connect(receiver, sender=Task)
+        self.addCleanup(post_save.disconnect, receiver, sender=Task)
+        task = Task.objects.get(pk=self.task.pk)
+        profile = Profile.objects.get(user=self.user)
+        with self.assertNumQueries(0):
+            task.save()
+            profile.save()
+        self.assertEqual(saved, [])
+
+    def test_only_changed_fields_are_updated(self):
+        task = Task.objects.get(pk=self.task.pk)
+        task.title = 'Alterada'
+        with CaptureQueriesContext(connection) as captured:
+            task.save()
+        update = next(query['sql'] for query in captured if query['sql'].startswith('UPDATE "task"'))
+        self.assertIn('"title"', update)
+        self.assertNotIn('"description"', update)
+        self.assertEqual(Task.objects.get(pk=task.pk).title, 'Alterada')
+        with self.assertNumQueries(0):
+            task.save() # the snapshot was taken again after the write
+
+    def test_refresh_takes_a_new_snapshot(self):
+        task = Task.objects.get(pk=self.task.pk)
+        Task.objects.filter(pk=task.pk).update(title='Outra', status='CONCLUIDA')
+        task.refresh_from_db()
+        task.title = 'Limpa'
+        task.status = 'PENDENTE'
+        task.save()
+        self.assertEqual(Task.objects.get(pk=task.pk).title, 'Limpa')
+        # The counters move from the refreshed status, not the one first loaded
+        Task.objects.filter(pk=task.pk).update(status='CONCLUIDA')
+        rebuild_user_stats([self.user.pk])
+        task.refresh_from_db(fields=['status'])
+        task.status = 'CANCELADA'
+        task.save()
+        counts = get_user_status_counts(self.user)
+        self.assertEqual((counts['PENDENTE'], counts['CONCLUIDA'], counts['CANCELADA']), (0, 0, 1))
+
+    def test_in_place_json_change_is_detected(self):
+        profile = Profile.objects.get(user=self.user)
+        profile.preference['tema'] = 'dark'
+        profile.save()
+        self.assertEqual(Profile.objects.get(pk=profile.pk).preference, {'tema': 'dark'})
+
+    def test_deferred_instance_saves_assigned_fields(self):
+        task = Task.objects.only('id', 'title').get(pk=self.task.pk)
+        task.title = 'Parcial'
+        task.save()
+        self.assertEqual(Task.objects.get(pk=task.pk).title, 'Parcial')
+
+
+class EventsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='eventos', email='eventos@mail.com', password='senha12345')
+        self.other = User.objects.create_user(username='vizinho', email='vizinho@mail.com', password='senha12345')
+        patcher = mock.patch('core.events._broker', InProcessBroker())
+        self.broker = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def committed(self, function, *args, **kwargs):
+        # Events are published on commit
+        with self.captureOnCommitCallbacks(execute=True):
+            return function(*args, **kwargs)
+
+    async def test_task_save_reaches_only_the_owners_streams(self):
+        async with self.broker.subscribe(self.user.pk) as mine, self.broker.subscribe(self.other.pk) as theirs:
+            task = await sync_to_async(self.committed)(Task.objects.create, title='Ao vivo', user=self.user)
+            message = await mine.get(timeout=1)
+            self.assertEqual(message['event'], 'progress')
+            self.assertEqual((message['data']['id'], message['data']['status']), (task.pk, 'PENDENTE'))
+            self.assertIsNone(await theirs.get(timeout=0.05))
+        self.assertEqual(self.broker._subscribers, {})
+
+    async def test_stream_sends_new_notifications(self):
+        stream = event_stream(self.user.pk)
+        self.assertTrue((await stream.__anext__()).startswith('retry: '))
+        pending = asyncio.ensure_future(stream.__anext__())
+        while self.user.pk not in self.broker._subscribers:
+            await asyncio.sleep(0)
+        await sync_to_async(self.committed)(Notification.objects.create, user=self.other, message='Alheia')
+        notification = await sync_to_async(self.committed)(Notification.objects.create, user=self.user, message='Lembrete')
+        chunk = await asyncio.wait_for(pending, 1)
+        event, data = chunk.strip().split('\n')
+        self.assertEqual(event, 'event: notification')
+        self.assertEqual(json.loads(data.removeprefix('data: '))['id'], notification.pk)
+        await stream.aclose()
+        self.assertEqual(self.broker._subscribers, {})
+
+    async def test_redis_broker_relays_the_channel_of_each_user(self):
+        published = []
+        channel = asyncio.Queue()
+
+        class PubSub:
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            async def psubscribe(self, pattern):
+                self.pattern = pattern
+
+            async def listen(self):
+                while True:
+                    yield await channel.get()
+
+        class AsyncClient:
+            def pubsub(self):
+                return PubSub()
+
+            async def aclose(self):
+                pass
+
+        fake_async = types.SimpleNamespace(Redis=types.SimpleNamespace(from_url=lambda url: AsyncClient()))
+        client = types.SimpleNamespace(publish=lambda name, data: published.append((name, data)))
+        fake = types.SimpleNamespace(Redis=types.SimpleNamespace(from_url=lambda url: client), asyncio=fake_async)
+        with mock.patch.dict(sys.modules, {'redis': fake, 'redis.asyncio': fake_async}):
+            broker = RedisBroker('redis://fake')
+            broker.publish(self.user.pk, {"event": "refresh", "data": {}})
+            self.assertEqual(published, [(f'todo:events:{self.user.pk}', '{"event": "refresh", "data": {}}')])
+            async with broker.subscribe(self.user.pk) as subscription:
+                for user_id, name in ((self.other.pk, 'alheio'), (self.user.pk, 'meu')):
+                    channel.put_nowait({
+                        'type': 'pmessage',
+                        'channel': f'todo:events:{user_id}'.encode(),
+                        'data': json.dumps({"event": name, "data": {}}).encode(),
+                    })
+                self.assertEqual((await subscription.get(timeout=1))['event'], 'meu')
+                self.assertIsNone(await subscription.get(timeout=0.05))
+            broker._listener.cancel()
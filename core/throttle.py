@@ -0,0 +1,96 @@
+"""
+    Sliding window counters kept in the shared cache. auths.views.AuthLogin counts an
+    attempt per client IP and per identifier before calling authenticate(), so a burst
+    of attempts is rejected without spending a password hash on each one.
+"""
+import hashlib
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from auths.models import normalize_phone_number
+from .metrics import register, CounterMetric
+
+login_attempts = register(CounterMetric('todo_login_attempts_total', 'Login attempts by throttling result.'))
+
+
+def get_cache():
+    return caches[getattr(settings, 'LOGIN_THROTTLE_CACHE', 'default')]
+
+
+class SlidingWindow:
+    """
+        At most `capacity` attempts per `period` seconds. Each fixed window of `period`
+        seconds is one cache counter, changed only with add() and incr()/decr(), which
+        are atomic on every backend: concurrent attempts are never lost. The count of
+        the previous window is weighted by how much of it still overlaps the last
+        `period` seconds, so there is no double burst at window boundaries.
+    """
+    def __init__(self, name, capacity, period):
+        self.name = name
+        self.capacity = capacity
+        self.period = period
+
+    def make_key(self, ident, window):
+        return f'throttle:{self.name}:{hashlib.md5(ident.encode()).hexdigest()}:{window}'
+
+    def consume(self, ident, now=None):
+        """ Count one attempt. Returns 0 when allowed, else the seconds until one is """
+        cache = get_cache()
+        now = time.time() if now is None else now
+        window = math.floor(now / self.period)
+        elapsed = now - window * self.period
+        key = self.make_key(ident, window)
+        # Kept for the next window too, where it is the previous count
+        timeout = int(2 * self.period) + 1
+        cache.add(key, 0, timeout=timeout)
+        try:
+            current = cache.incr(key)
+        except ValueError:
+            # Expired between add() and incr()
+            cache.add(key, 1, timeout=timeout)
+            current = 1
+        previous = cache.get(self.make_key(ident, window - 1)) or 0
+        if previous * (1 - elapsed / self.period) + current <= self.capacity:
+            return 0
+        # Refused attempts do not count
+        current = cache.decr(key)
+        if current < self.capacity:
+            # Allowed once enough of the previous window slides out
+            wait = self.period * (1 - (self.capacity - current - 1) / previous) - elapsed
+        else:
+            # Only in the next window, once this one has slid out enough
+            wait = self.period - elapsed + self.period * (1 - (self.capacity - 1) / current)
+        return max(wait, 0.001)
+
+
+def normalize_identifier(identifier):
+    """ Same bucket for every spelling of an email or phone number """
+    identifier = (identifier or '').strip()
+    if '@' in identifier:
+        return identifier.lower()
+    return normalize_phone_number(identifier) or identifier
+
+
+def throttle_login(request, identifier):
+    """
+        Seconds the client has to wait before trying again, 0 when the attempt may go on.
+        The IP window is checked first so that a throttled client does not also use up
+        the attempts of the account it is trying.
+    """
+    if not getattr(settings, 'LOGIN_THROTTLE_ENABLED', False):
+        return 0
+    rates = settings.LOGIN_THROTTLE_RATES
+    checks = [
+        ('ip', request.META.get('REMOTE_ADDR') or ''),
+        ('identifier', normalize_identifier(identifier)),
+    ]
+    for name, ident in checks:
+        wait = SlidingWindow(f'login:{name}', *rates[name]).consume(ident)
+        if wait:
+            login_attempts.inc(result=f'throttled_{name}')
+            return wait
+    login_attempts.inc(result='allowed')
+    return 0
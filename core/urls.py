@@ -1,6 +1,8 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
 urlpatterns = [
-    path('', views.Core.as_view(), name='index'),
+    path('', (views.AsyncCore if settings.ASYNC_VIEWS else views.Core).as_view(), name='index'),
+    path('metrics', views.MetricsView.as_view(), name='metrics'),
 ]
@@ -1,29 +1,187 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.http import HttpResponse, Http404
 from django.core.paginator import Paginator
 from django.contrib.auth.mixins import LoginRequiredMixin
 # from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.views import View
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+from django.utils.functional import SimpleLazyObject
+from django.utils.cache import get_conditional_response, patch_cache_control, quote_etag
+from django.conf import settings
+from django.utils import timezone
+import hashlib
 # from .utils import send_reset_password_email
 # from django.contrib.auth import get_user_model
 
-from task.models import Task, Category
+from task.models import Task, Category, STATUS_CHOICES, PRIORITY_CHOICES
+from task.repository import ACTIVE_STATUSES
+from task.services import TaskService
+from task.stats import get_user_status_counts, aget_user_status_counts
+from .cache import dashboard_fragment, get_dashboard_version, adashboard_fragment, aget_dashboard_version
+from .mixins import AsyncLoginRequiredMixin
+from .db_router import replica_reads
+from .metrics import render_metrics
 from datetime import date
 
 # User = get_user_model()
 
 class Core(LoginRequiredMixin, View):
     model = Task
+    service = TaskService()
     template_name = "index.html"
+    paginate_by = 20
     
+    def get_filters(self, request):
+        """ Read the dashboard filters from the querystring, ignoring unknown values """
+        statuses = dict(STATUS_CHOICES)
+        priorities = dict(PRIORITY_CHOICES)
+        status = [value for value in request.GET.getlist('status') if value in statuses] or ACTIVE_STATUSES
+        priority = [value for value in request.GET.getlist('priority') if value in priorities]
+        category = request.GET.get('category')
+        category = int(category) if category and category.isdigit() else None
+        due_within = request.GET.get('due')
+        due_within = int(due_within) if due_within and due_within.isdigit() else None
+        order = 'urgency' if request.GET.get('order') == 'urgency' else 'recent'
+        return {"status": status, "priority": priority, "category": category, "due_within": due_within, "order": order}
+    
+    def get_etag(self, request):
+        """
+            Validator of the page without touching the database: the dashboard version
+            (bumped on every task/category change), the querystring, today's date and
+            the CSRF cookie embedded in the create form.
+            There is no Last-Modified: the version is a counter, and a date could not
+            tell a rotated CSRF token or another day apart.
+        """
+        return self.build_etag(request, get_dashboard_version(request.user.pk))
+    
+    def build_etag(self, request, version):
+        raw = ':'.join([
+            str(request.user.pk),
+            str(version),
+            request.GET.urlencode(),
+            # days remaining change at midnight
+            str(timezone.localdate()),
+            request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+        ])
+        return quote_etag(hashlib.md5(raw.encode()).hexdigest())
+    
+    @replica_reads()
     def get(self, request, *args, **kwargs):
-        # Buscar tarefas do usuário logado
-        tasks = self.model.objects.filter(user=request.user).order_by('-date_creation')
-        # Buscar categorias do usuário
-        categories = Category.objects.filter(user=request.user)
+        # Flash messages are part of the page: only revalidate when there are none
+        etag = None if len(messages.get_messages(request)) else self.get_etag(request)
+        if etag:
+            not_modified = get_conditional_response(request, etag=etag)
+            if not_modified is not None:
+                return not_modified
+        
+        filters = self.get_filters(request)
+        # Buscar categorias do usuário (lazy: só consulta quando algum fragmento é montado)
+        categories = SimpleLazyObject(lambda: self.service.getRepository().getUserCategories(request.user))
+        
+        def build_tasks():
+            # Buscar apenas uma pagina de tarefas do usuário logado
+            tasks, next_cursor = self.service.getRepository().getTaskPage(
+                request.user,
+                cursor=request.GET.get('cursor'),
+                limit=self.paginate_by,
+                **filters
+            )
+            counts = get_user_status_counts(request.user)
+            return self.render_tasks(request, filters, tasks, next_cursor, counts, categories)
         
-        return render(request, self.template_name, {
+        def build_categories():
+            return render_to_string("partials/category_options.html", {"categories": categories}, request)
+        
+        user_id = request.user.pk
+        return self.render_dashboard(
+            request, etag,
+            dashboard_fragment(user_id, 'tasks', self.get_tasks_vary_on(request), build_tasks),
+            dashboard_fragment(user_id, 'categories', '', build_categories),
+        )
+    
+    def get_tasks_vary_on(self, request):
+        return f'{timezone.localdate()}?{request.GET.urlencode()}'
+    
+    def render_tasks(self, request, filters, tasks, next_cursor, counts, categories):
+        next_query = None
+        if next_cursor:
+            query = request.GET.copy()
+            query['cursor'] = next_cursor
+            next_query = query.urlencode()
+        return render_to_string("partials/task_list.html", {
             "list_with_status": tasks,
-            "categories": categories
+            "status_counts": [(value, label, counts[value]) for value, label in STATUS_CHOICES],
+            "categories": categories,
+            "filters": filters,
+            "status_choices": STATUS_CHOICES,
+            "priority_choices": PRIORITY_CHOICES,
+            "next_query": next_query,
+        }, request)
+    
+    def render_dashboard(self, request, etag, tasks_html, categories_html):
+        response = render(request, self.template_name, {
+            "tasks_html": mark_safe(tasks_html),
+            "categories_html": mark_safe(categories_html),
         })
+        if etag:
+            response['ETag'] = etag
+        # Per user page: browsers keep it but must revalidate every time
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
 
+
+class AsyncCore(AsyncLoginRequiredMixin, Core):
+    """
+        Core for ASGI: same page and caches, with the database and cache reads awaited
+        (async ORM) instead of holding a thread per request.
+    """
+    async def get(self, request, *args, **kwargs):
+        etag = None
+        if not len(messages.get_messages(request)):
+            etag = self.build_etag(request, await aget_dashboard_version(request.user.pk))
+            not_modified = get_conditional_response(request, etag=etag)
+            if not_modified is not None:
+                return not_modified
+        
+        filters = self.get_filters(request)
+        repository = self.service.getRepository()
+        categories = None
+        
+        async def get_categories():
+            nonlocal categories
+            if categories is None:
+                categories = [category async for category in Category.objects.filter(user=request.user)]
+            return categories
+        
+        async def build_tasks():
+            with replica_reads():
+                tasks, next_cursor = await repository.agetTaskPage(
+                    request.user, cursor=request.GET.get('cursor'), limit=self.paginate_by, **filters
+                )
+                counts = await aget_user_status_counts(request.user)
+                return self.render_tasks(request, filters, tasks, next_cursor, counts, await get_categories())
+        
+        async def build_categories():
+            with replica_reads():
+                return render_to_string("partials/category_options.html", {"categories": await get_categories()}, request)
+        
+        user_id = request.user.pk
+        return self.render_dashboard(
+            request, etag,
+            await adashboard_fragment(user_id, 'tasks', self.get_tasks_vary_on(request), build_tasks),
+            await adashboard_fragment(user_id, 'categories', '', build_categories),
+        )
+
+
+class MetricsView(View):
+    """
+        Prometheus scrape endpoint. Open to settings.METRICS_ALLOWED_IPS and staff users,
+        404 for everyone else and when request metrics are disabled.
+    """
+    def get(self, request, *args, **kwargs):
+        allowed = request.META.get('REMOTE_ADDR') in getattr(settings, 'METRICS_ALLOWED_IPS', []) or request.user.is_staff
+        if not getattr(settings, 'REQUEST_METRICS_ENABLED', False) or not allowed:
+            raise Http404
+        return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Task, Category, Progress, Notification, Report, DailyRegister
+from .models import Task, Category, Progress, Notification, Report, DailyRegister, UserTaskStat, CategoryTaskStat, Tombstone
 
 
 # Register your models here.
@@ -10,3 +10,6 @@ admin.site.register(Progress)
 admin.site.register(Notification)
 admin.site.register(Report)
 admin.site.register(DailyRegister)
+admin.site.register(UserTaskStat)
+admin.site.register(CategoryTaskStat)
+admin.site.register(Tombstone)
@@ -0,0 +1,124 @@
+"""
+    Streaming export of a user's data as CSV or NDJSON, optionally gzipped (TaskExportView).
+
+    Rows come from `.values_list(...).iterator()` and are encoded chunk by chunk,
+    so memory stays bounded whatever the size of the account.
+"""
+import csv
+import json
+import zlib
+from datetime import date, datetime
+
+from asgiref.sync import sync_to_async
+from django.db import router
+
+from core.db_router import replica_reads
+from .models import Task, Progress, DailyRegister
+
+# Rows fetched from the database per round trip
+CHUNK_SIZE = 2000
+# Encoded bytes gathered before a piece of the response is sent
+FLUSH_SIZE = 64 * 1024
+
+DATASETS = {
+    'tasks': (
+        ['id', 'title', 'description', 'category', 'date_expired', 'priority', 'status', 'progress_points', 'concluded', 'date_creation', 'date_update'],
+        lambda user: Task.objects.filter(user=user).order_by('id').values_list(
+            'id', 'title', 'description', 'category__name', 'date_expired', 'priority', 'status',
+            'progress_points', 'concluded', 'date_creation', 'date_update',
+        ),
+    ),
+    'progress': (
+        ['task_id', 'percentage', 'note', 'date_update'],
+        lambda user: Progress.objects.filter(task__user=user).order_by('task_id').values_list(
+            'task_id', 'percentage', 'note', 'date_update',
+        ),
+    ),
+    'daily': (
+        ['id', 'task_id', 'conclusion_date', 'completed_per_id'],
+        lambda user: DailyRegister.objects.filter(task__user=user).order_by('id').values_list(
+            'id', 'task_id', 'conclusion_date', 'completed_per_id',
+        ),
+    ),
+}
+
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+
+
+def _to_text(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+class _Echo:
+    """ File-like object for csv.writer: returns the line instead of storing it """
+    def write(self, value):
+        return value
+
+
+def iter_csv(columns, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow([_to_text(value) for value in row])
+
+
+def iter_ndjson(columns, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(columns, map(_to_text, row))), ensure_ascii=False) + '\n'
+
+
+def iter_chunks(lines, compress=False):
+    """ Join encoded lines into pieces of about FLUSH_SIZE bytes, gzipped when `compress` """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None # wbits 31: gzip container
+    buffer, size = [], 0
+    for line in lines:
+        data = line.encode()
+        buffer.append(data)
+        size += len(data)
+        if size >= FLUSH_SIZE:
+            data = b''.join(buffer)
+            buffer, size = [], 0
+            data = compressor.compress(data) if compressor else data
+            if data:
+                yield data
+    data = b''.join(buffer)
+    if compressor:
+        data = compressor.compress(data) + compressor.flush()
+    if data:
+        yield data
+
+
+def export_rows(user, dataset, format='csv', compress=False, chunk_size=CHUNK_SIZE):
+    """
+        Iterator over the response body. The database alias is chosen now, during the
+        request (replica unless pinned to the primary), but rows are only read while
+        the response is being sent.
+    """
+    columns, build_queryset = DATASETS[dataset]
+    with replica_reads():
+        alias = router.db_for_read(Task)
+    rows = build_queryset(user).using(alias).iterator(chunk_size=chunk_size)
+    lines = iter_csv(columns, rows) if format == 'csv' else iter_ndjson(columns, rows)
+    return iter_chunks(lines, compress=compress)
+
+
+async def aexport_rows(user, dataset, format='csv', compress=False, chunk_size=CHUNK_SIZE):
+    """
+        export_rows for ASGI responses. Django would load a sync iterator whole into
+        memory before sending it; here each piece is produced in the (same) worker
+        thread only when the previous one has been sent.
+    """
+    chunks = await sync_to_async(export_rows)(user, dataset, format, compress, chunk_size)
+    try:
+        while True:
+            chunk = await sync_to_async(next)(chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+    finally:
+        await sync_to_async(chunks.close)()
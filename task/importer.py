@@ -0,0 +1,232 @@
+"""
+    Streaming import of tasks from CSV, JSON lines or a JSON array (`manage.py import_tasks`
+    and TaskImportView).
+
+    Rows are read one at a time, validated with the TaskForm field rules and written
+    in fixed-size batches, so memory does not depend on the size of the file
+    (JSON arrays are decoded element by element, see iter_json_rows).
+"""
+import csv
+import json
+from itertools import chain, islice
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .forms import TaskForm
+from .models import Task, Category
+
+# Errors kept in the result; the rest are only counted
+MAX_REPORTED_ERRORS = 100
+# Characters read at a time from a .json file, and the longest element of a JSON array
+READ_SIZE = 64 * 1024
+MAX_JSON_ROW_SIZE = 1024 * 1024
+
+
+def detect_format(filename):
+    filename = (filename or '').lower()
+    if filename.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    if filename.endswith('.json'):
+        return 'json'
+    return 'csv'
+
+
+def _read_pieces(stream):
+    """ Text of a file object in READ_SIZE pieces; other iterables (lines, decoded chunks) as they are """
+    if hasattr(stream, 'read'):
+        return iter(lambda: stream.read(READ_SIZE), '')
+    return iter(stream)
+
+
+def _split_lines(pieces):
+    rest = ''
+    for piece in pieces:
+        lines = (rest + piece).split('\n')
+        rest = lines.pop()
+        yield from lines
+    if rest:
+        yield rest
+
+
+def iter_json_rows(stream):
+    """
+        Rows of a .json file: a JSON array of objects (numbered by position, from 1),
+        or JSON lines saved with the .json extension.
+        
+        The array is decoded one element at a time (JSONDecoder.raw_decode) from a buffer
+        that only holds the element being read: an element longer than MAX_JSON_ROW_SIZE,
+        or invalid JSON, ends the import of the file with an error on that position.
+    """
+    pieces = _read_pieces(stream)
+    head = []
+    for piece in pieces:
+        head.append(piece)
+        if piece.strip():
+            break
+    buffer = ''.join(head).lstrip()
+    if not buffer.startswith('['):
+        yield from iter_rows(_split_lines(chain(head, pieces)), 'jsonl')
+        return
+    
+    decoder = json.JSONDecoder()
+    pieces_left = True
+    buffer, number, expect_comma = buffer[1:], 0, False
+    
+    def fill():
+        nonlocal buffer, pieces_left
+        piece = next(pieces, None)
+        if piece is None:
+            pieces_left = False
+        else:
+            buffer += piece
+        return pieces_left
+    
+    while True:
+        buffer = buffer.lstrip()
+        if not buffer:
+            if fill():
+                continue
+            # Unterminated array
+            yield number + 1, None
+            return
+        if buffer[0] == ']':
+            return
+        if expect_comma:
+            if buffer[0] != ',':
+                yield number + 1, None
+                return
+            buffer, expect_comma = buffer[1:], False
+            continue
+        try:
+            row, end = decoder.raw_decode(buffer)
+        except ValueError:
+            row, end = None, None
+        # A value reaching the end of the buffer may go on in the next piece (ex: a number)
+        if end is None or end == len(buffer):
+            if len(buffer) <= MAX_JSON_ROW_SIZE and fill():
+                continue
+            if end is None:
+                yield number + 1, None
+                return
+        if end > MAX_JSON_ROW_SIZE:
+            yield number + 1, None
+            return
+        number += 1
+        yield number, row if isinstance(row, dict) else None
+        buffer, expect_comma = buffer[end:], True
+
+
+def iter_rows(stream, format='csv'):
+    """ Yield (line number, dict) from text lines of CSV (with header), JSON lines or a JSON array """
+    if format == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    if format == 'json':
+        yield from iter_json_rows(stream)
+        return
+    for number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield number, row if isinstance(row, dict) else None
+
+
+class CategoryMap:
+    """
+        Categories of the user by id and by (case insensitive) name, loaded once.
+        Unknown names are created on first use, inside the transaction of the batch
+        being validated (see import_tasks): a batch that fails leaves no categories behind.
+    """
+    def __init__(self, user):
+        self.user = user
+        self.by_id, self.by_name = {}, {}
+        for category in Category.objects.filter(user=user):
+            self.add(category)
+
+    def add(self, category):
+        self.by_id[category.pk] = category
+        self.by_name.setdefault(category.name.strip().lower(), category)
+
+    def resolve(self, value):
+        value = str(value).strip() if value is not None else ''
+        if not value:
+            return None
+        if value.isdigit() and int(value) in self.by_id:
+            return self.by_id[int(value)]
+        category = self.by_name.get(value.lower())
+        if category is None:
+            category = Category.objects.create(name=value[:100], user=self.user)
+            self.add(category)
+        return category
+
+
+class RowValidator:
+    """
+        Clean rows with the fields of TaskForm (same required/length/choice/date rules)
+        without building a form per row. The category is resolved by CategoryMap instead
+        of one query per row, and empty columns with a model default take that default.
+    """
+    def __init__(self, categories):
+        self.categories = categories
+        self.fields = {name: field for name, field in TaskForm.base_fields.items() if name != 'category'}
+        self.defaults = {
+            name: Task._meta.get_field(name).get_default()
+            for name in self.fields if Task._meta.get_field(name).has_default()
+        }
+
+    def clean(self, row):
+        """ Returns (data, errors) """
+        data, errors = {}, {}
+        for name, field in self.fields.items():
+            value = row.get(name)
+            if value in (None, '') and name in self.defaults:
+                data[name] = self.defaults[name]
+                continue
+            try:
+                data[name] = field.clean(value)
+            except ValidationError as error:
+                errors[name] = error.messages
+        if not errors:
+            data['category'] = self.categories.resolve(row.get('category'))
+        return data, errors
+
+
+def import_tasks(user, rows, service, batch_size=500):
+    """
+        Create the tasks of `rows` ((line, dict) pairs) for `user`, `batch_size` at a time.
+        Each batch is validated and written (one TaskService.bulkSync call) in its own
+        transaction, new categories included, with counters, progress, search index and
+        dashboard updated set-based.
+        Returns {"created": n, "failed": n, "errors": [{"line": n, "errors": {...}}, ...]}.
+    """
+    validator = RowValidator(CategoryMap(user))
+    result = {"created": 0, "failed": 0, "errors": []}
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, batch_size))
+        if not chunk:
+            return result
+        # Categories created while validating commit (or roll back) with the tasks of the batch
+        with transaction.atomic():
+            batch, failed, errors = [], 0, []
+            for number, row in chunk:
+                if row is None:
+                    data, row_errors = None, {"__all__": ["Linha inválida."]}
+                else:
+                    data, row_errors = validator.clean(row)
+                if row_errors:
+                    failed += 1
+                    errors.append({"line": number, "errors": row_errors})
+                else:
+                    batch.append(data)
+            created = service.bulkSync(user, creates=batch)[0] if batch else []
+        result["created"] += len(created)
+        result["failed"] += failed
+        result["errors"].extend(errors[:MAX_REPORTED_ERRORS - len(result["errors"])])
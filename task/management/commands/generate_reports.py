@@ -0,0 +1,28 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from task.reports import generate_reports
+
+
+class Command(BaseCommand):
+    help = "Generate the Report of every user for a period, using grouped queries and an optional process pool."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=date.fromisoformat, default=None, help='First day of the period (default: first day of the month).')
+        parser.add_argument('--end', type=date.fromisoformat, default=None, help='Last day of the period (default: today).')
+        parser.add_argument('--workers', type=int, default=1, help='Processes used to build the batches.')
+        parser.add_argument('--batch-size', type=int, default=500, help='Users per batch.')
+        parser.add_argument('--incremental', action='store_true', help='Only users whose tasks changed since their last report.')
+
+    def handle(self, *args, **options):
+        end = options['end'] or timezone.localdate()
+        start = options['start'] or end.replace(day=1)
+        total = generate_reports(
+            start, end,
+            workers=options['workers'],
+            batch_size=options['batch_size'],
+            incremental=options['incremental'],
+        )
+        self.stdout.write(f'{total} reports generated ({start} to {end})')
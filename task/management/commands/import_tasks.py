@@ -0,0 +1,42 @@
+import io
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from auths.models import User
+from task.importer import detect_format, iter_rows, import_tasks
+from task.services import TaskService
+
+
+class Command(BaseCommand):
+    help = "Import tasks for a user from a CSV (with header), JSON lines or JSON array file, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import, or '-' for stdin.")
+        parser.add_argument('--user', required=True, help='Email or id of the owner of the tasks.')
+        parser.add_argument('--format', choices=['csv', 'jsonl', 'json'], help='Default: guessed from the file extension.')
+        parser.add_argument('--batch-size', type=int, default=500, help='Tasks inserted per transaction.')
+
+    def get_user(self, value):
+        lookup = {'pk': int(value)} if value.isdigit() else {'email__iexact': value}
+        try:
+            return User.objects.get(**lookup)
+        except User.DoesNotExist:
+            raise CommandError(f'User "{value}" not found.')
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['user'])
+        format = options['format'] or detect_format(options['path'])
+        if options['path'] == '-':
+            stream = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8-sig', newline='')
+        else:
+            try:
+                stream = open(options['path'], encoding='utf-8-sig', newline='')
+            except OSError as error:
+                raise CommandError(error)
+        with stream:
+            result = import_tasks(user, iter_rows(stream, format), TaskService(), batch_size=options['batch_size'])
+        for error in result['errors']:
+            self.stderr.write(f"line {error['line']}: {json.dumps(error['errors'], ensure_ascii=False)}")
+        self.stdout.write(f"{result['created']} tasks created, {result['failed']} rows rejected")
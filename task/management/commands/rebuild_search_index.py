@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from task.search import get_backend, index_all
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index of tasks (title, description and category name)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Tasks indexed per statement.')
+
+    def handle(self, *args, **options):
+        if get_backend() is None:
+            self.stdout.write('This database has no search index, nothing to do')
+            return
+        total = index_all(chunk_size=options['chunk_size'])
+        self.stdout.write(f'Search index rebuilt for {total} tasks')
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from auths.models import User
+from task.models import Category
+from task.stats import rebuild_user_stats, rebuild_category_stats
+
+
+def iter_ids(queryset, batch_size):
+    last_id = 0
+    while True:
+        ids = list(queryset.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return
+        last_id = ids[-1]
+        yield ids
+
+
+class Command(BaseCommand):
+    help = "Recompute the per-user and per-category task counters from the task table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Users/categories rebuilt per transaction.')
+
+    def handle(self, *args, **options):
+        users = categories = 0
+        for ids in iter_ids(User.objects.all(), options['batch_size']):
+            rebuild_user_stats(ids)
+            users += len(ids)
+        for ids in iter_ids(Category.objects.all(), options['batch_size']):
+            rebuild_category_stats(ids)
+            categories += len(ids)
+        self.stdout.write(f'Counters rebuilt for {users} users and {categories} categories')
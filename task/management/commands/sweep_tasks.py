@@ -0,0 +1,25 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from task.services import TaskService
+
+
+class Command(BaseCommand):
+    help = "Conclude expired tasks, create reminders for tasks due soon and purge old tombstones. Meant to run nightly (cron/Celery beat)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=1, help='Remind tasks due within this many days.')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Rows handled per query.')
+        parser.add_argument('--date', type=date.fromisoformat, default=None, help='Run as if today were this date (YYYY-MM-DD).')
+
+    def handle(self, *args, **options):
+        result = TaskService().sweepSchedules(
+            today=options['date'],
+            remind_days=options['days'],
+            chunk_size=options['chunk_size'],
+        )
+        self.stdout.write(
+            f"{result['concluded']} tasks concluded, {result['reminders']} reminders created, "
+            f"{result['tombstones']} tombstones purged"
+        )
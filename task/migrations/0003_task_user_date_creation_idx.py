@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-18 05:19
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('task', '0002_preference_remove_task_day_expired_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['user', '-date_creation', '-id'], name='task_user_id_0191d5_idx'),
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.8 on 2026-10-18 05:27
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_task_stats(apps, schema_editor):
+    Task = apps.get_model('task', 'Task')
+    UserTaskStat = apps.get_model('task', 'UserTaskStat')
+    CategoryTaskStat = apps.get_model('task', 'CategoryTaskStat')
+    user_rows = Task.objects.filter(user__isnull=False).values('user_id', 'status', 'priority').annotate(total=Count('id')).order_by()
+    UserTaskStat.objects.bulk_create(
+        [UserTaskStat(user_id=row['user_id'], status=row['status'], priority=row['priority'], count=row['total']) for row in user_rows],
+        batch_size=1000,
+    )
+    category_rows = Task.objects.filter(category__isnull=False).values('category_id', 'status', 'priority').annotate(total=Count('id')).order_by()
+    CategoryTaskStat.objects.bulk_create(
+        [CategoryTaskStat(category_id=row['category_id'], status=row['status'], priority=row['priority'], count=row['total']) for row in category_rows],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('task', '0003_task_user_date_creation_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryTaskStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('PENDENTE', 'Pendente'), ('EM_ANDAMENTO', 'Em Andamento'), ('CONCLUIDA', 'Concluída'), ('CANCELADA', 'Cancelada')], max_length=15)),
+                ('priority', models.CharField(choices=[('BAIXA', 'Baixa'), ('MEDIA', 'Média'), ('ALTA', 'Alta')], max_length=10)),
+                ('count', models.IntegerField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='task_stats', to='task.category')),
+            ],
+            options={
+                'verbose_name': 'Category Task Stat',
+                'verbose_name_plural': 'Category Task Stats',
+                'db_table': 'category_task_stat',
+                'constraints': [models.UniqueConstraint(fields=('category', 'status', 'priority'), name='unique_category_task_stat')],
+            },
+        ),
+        migrations.CreateModel(
+            name='UserTaskStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('PENDENTE', 'Pendente'), ('EM_ANDAMENTO', 'Em Andamento'), ('CONCLUIDA', 'Concluída'), ('CANCELADA', 'Cancelada')], max_length=15)),
+                ('priority', models.CharField(choices=[('BAIXA', 'Baixa'), ('MEDIA', 'Média'), ('ALTA', 'Alta')], max_length=10)),
+                ('count', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='task_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'User Task Stat',
+                'verbose_name_plural': 'User Task Stats',
+                'db_table': 'user_task_stat',
+                'constraints': [models.UniqueConstraint(fields=('user', 'status', 'priority'), name='unique_user_task_stat')],
+            },
+        ),
+        migrations.RunPython(fill_task_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    # The index is filled here with plain SQL, frozen as of this migration:
+    # later changes to task.search must not change what this migration does
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE task_search USING fts5("
+            "title, description, category, owner, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(
+            "INSERT INTO task_search (rowid, title, description, category, owner) "
+            "SELECT t.id, t.title, COALESCE(t.description, ''), COALESCE(c.name, ''), 'u' || t.user_id "
+            "FROM task t LEFT JOIN category c ON c.id = t.category_id"
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            "CREATE TABLE task_search ("
+            "task_id bigint PRIMARY KEY REFERENCES task (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+            "user_id bigint, document tsvector NOT NULL)"
+        )
+        schema_editor.execute(
+            "INSERT INTO task_search (task_id, user_id, document) "
+            "SELECT t.id, t.user_id, "
+            "setweight(to_tsvector('portuguese', t.title), 'A') || "
+            "setweight(to_tsvector('portuguese', COALESCE(t.description, '')), 'B') || "
+            "setweight(to_tsvector('portuguese', COALESCE(c.name, '')), 'C') "
+            "FROM task t LEFT JOIN category c ON c.id = t.category_id"
+        )
+        # Indexes built after the bulk fill
+        schema_editor.execute("CREATE INDEX task_search_document_idx ON task_search USING GIN (document)")
+        schema_editor.execute("CREATE INDEX task_search_user_idx ON task_search (user_id)")
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        schema_editor.execute("DROP TABLE IF EXISTS task_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('task', '0006_task_user_date_expired_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:12
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def remove_duplicate_reports(apps, schema_editor):
+    """ Keep the newest report of each (user, period) before the constraint is added """
+    Report = apps.get_model('task', 'Report')
+    latest = (
+        Report.objects.values('user_id', 'initial_period', 'end_period')
+        .annotate(last_id=Max('id'))
+        .values_list('last_id', flat=True)
+    )
+    Report.objects.exclude(id__in=list(latest)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('task', '0007_task_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_reports, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='report',
+            name='report_user_id_d3c86d_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='report',
+            constraint=models.UniqueConstraint(fields=('user', 'initial_period', 'end_period'), name='report_user_period_uniq'),
+        ),
+    ]
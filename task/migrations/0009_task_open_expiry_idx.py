@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:14
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('task', '0008_report_user_period_uniq'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='task',
+            name='task_date_ex_e2ee9a_idx',
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('concluded', False)), fields=['date_expired', 'id'], name='task_open_expiry_idx'),
+        ),
+    ]
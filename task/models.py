@@ -1,5 +1,6 @@
-from django.db import models
+from django.db import models, transaction
 from auths.models import User
+from core.models import DirtyFieldsMixin
 from django.core.validators import MinValueValidator, MaxValueValidator
 from datetime import date
 
@@ -17,6 +18,12 @@ STATUS_CHOICES = [
     ('CANCELADA', 'Cancelada'),
 ]
 
+# Progress.percentage implied by a task status (other statuses keep the current value)
+PROGRESS_BY_STATUS = {
+    'CONCLUIDA': 100,
+    'PENDENTE': 0,
+}
+
 NOTIFICATION_TYPE_CHOICES = [
     ('LEMBRETE', 'Lembrete'),
     ('ATUALIZACAO', 'Atualização'),
@@ -32,6 +39,7 @@ class Category(models.Model):
     color =  models.CharField(max_length=7, default='#000000') # Hex color for UI
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='categories', null=True, blank=True) # Optional
     date_creation = models.DateTimeField(auto_now_add=True)
+    date_update = models.DateTimeField(auto_now=True)
     
     class Meta:
         db_table = 'category'
@@ -39,6 +47,7 @@ class Category(models.Model):
         verbose_name_plural = 'Categories'
         indexes = [ # Indices for performance
             models.Index(fields=['name', 'user']),
+            models.Index(fields=['user', 'date_update', 'id']), # delta sync
         ]
     
     # def save(self, **kwargs):
@@ -48,7 +57,7 @@ class Category(models.Model):
         return self.name
     
 
-class Task(models.Model):
+class Task(DirtyFieldsMixin, models.Model):
     """
         Main Tasks of App.
     """ 
@@ -73,27 +82,54 @@ class Task(models.Model):
         verbose_name_plural = 'Tasks'
         indexes = [ # indexes for performance
             models.Index(fields=['user', 'status']),
-            models.Index(fields=['date_expired']),
+            # nightly sweep: only open tasks, walked as a (date_expired, id) keyset
+            models.Index(fields=['date_expired', 'id'], condition=models.Q(concluded=False), name='task_open_expiry_idx'),
+            models.Index(fields=['user', '-date_creation', '-id']), # keyset pagination of dashboard
+            models.Index(fields=['user', 'date_update', 'id']), # delta sync
+            models.Index(fields=['user', 'date_expired', 'id']), # sort by urgency / due within N days
         ]
         
     
     def __str__(self):
         return self.title
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Values as loaded, used by task.signals to move the statistics counters
+        # (with deferred columns task.signals reads them when the task is saved)
+        if not instance.get_deferred_fields() & {'user_id', 'category_id', 'status', 'priority'}:
+            instance._loaded_stat_key = instance.get_stat_key()
+        return instance
+    
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        # Counters move from the stored key: take it from the values just read
+        loaded = [self.get_loaded_value(name, KeyError) for name in ('user_id', 'category_id', 'status', 'priority')]
+        if KeyError not in loaded:
+            self._loaded_stat_key = tuple(loaded)
+    
+    def get_stat_key(self):
+        return (self.user_id, self.category_id, self.status, self.priority)
+    
+    def save(self, *args, **kwargs):
+        if self.is_unchanged(**kwargs):
+            return
+        # Counters are updated by post_save: keep them in the same transaction as the row
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+        self._loaded_stat_key = self.get_stat_key()
+    
+    def delete(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using')):
+            return super().delete(*args, **kwargs)
+    
     # def divide_(self): return int((100 // self.day_expired))
     
     # def update_progress_points(self): self.progress_points += self.divide_()
     
     def get_progress_points(self): return self.progress_points
     
-    def get_day_expired(self):
-        if (self.date_expired.year == self.date_creation.year) and (self.date_expired.month > self.date_creation.month) and (self.date_expired.day > self.date_creation.day):
-            return int(self.date_expired.day - self.date_creation.day)
-        elif (self.date_expired.year == self.date_creation.year) and (self.date_expired.month == self.date_creation.month) and (self.date_expired.day > self.date_creation.day):
-            return int(self.date_expired.day - self.date_creation.day)
-        elif (self.date_expired.year > self.date_creation.year) and (self.date_expired.month < self.date_creation.month) and (self.date_expired.day < self.date_creation.day):
-            return int(self.date_creation.day - self.date_expired.day)
-    
     def verifying_schedule_finished(self):
         if self.date_expired == date.today():
             return True
@@ -192,8 +228,8 @@ class Report(models.Model):
         db_table = 'report'
         verbose_name = 'Report'
         verbose_name_plural = 'Reports'
-        indexes = [# Indexes for reports for user and period
-            models.Index(fields=['user', 'initial_period', 'end_period']),
+        constraints = [# One report per user and period, regenerating it replaces the old one
+            models.UniqueConstraint(fields=['user', 'initial_period', 'end_period'], name='report_user_period_uniq'),
         ]
         
     def __str__(self):
@@ -208,4 +244,65 @@ class Preference(models.Model):
     theme = models.CharField(max_length=5, choices=[('dark', 'Dark'), ('light', 'Light')], default='dark')
     language = models.CharField(max_length=2, choices=[('pt', 'Português'), ('en', 'Inglês')], default='pt')
     
-    def __str__(self): return f"Theme: {self.theme}, Language: {self.language}"
\ No newline at end of file
+    def __str__(self): return f"Theme: {self.theme}, Language: {self.language}"
+
+
+class Tombstone(models.Model):
+    """
+        Record of a deleted task or category, so sync clients can remove it too.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='tombstones')
+    model = models.CharField(max_length=10, choices=[('task', 'Task'), ('category', 'Category')])
+    object_id = models.BigIntegerField()
+    date_deleted = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'tombstone'
+        verbose_name = 'Tombstone'
+        verbose_name_plural = 'Tombstones'
+        indexes = [
+            models.Index(fields=['user', 'date_deleted', 'id']),
+        ]
+    
+    def __str__(self): return f'{self.model} {self.object_id} deleted at {self.date_deleted}'
+
+
+class TaskStatBase(models.Model):
+    """
+        Number of tasks per (status, priority), kept up to date by task.signals.
+        Rebuild with `python manage.py rebuild_task_stats` if it ever drifts.
+    """
+    status = models.CharField(max_length=15, choices=STATUS_CHOICES)
+    priority = models.CharField(max_length=10, choices=PRIORITY_CHOICES)
+    count = models.IntegerField(default=0)
+    
+    class Meta:
+        abstract = True
+
+
+class UserTaskStat(TaskStatBase):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='task_stats')
+    
+    class Meta:
+        db_table = 'user_task_stat'
+        verbose_name = 'User Task Stat'
+        verbose_name_plural = 'User Task Stats'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'status', 'priority'], name='unique_user_task_stat'),
+        ]
+    
+    def __str__(self): return f'{self.user_id} {self.status}/{self.priority}: {self.count}'
+
+
+class CategoryTaskStat(TaskStatBase):
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='task_stats')
+    
+    class Meta:
+        db_table = 'category_task_stat'
+        verbose_name = 'Category Task Stat'
+        verbose_name_plural = 'Category Task Stats'
+        constraints = [
+            models.UniqueConstraint(fields=['category', 'status', 'priority'], name='unique_category_task_stat'),
+        ]
+    
+    def __str__(self): return f'{self.category_id} {self.status}/{self.priority}: {self.count}'
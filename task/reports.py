@@ -0,0 +1,109 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from decimal import Decimal
+
+from django.db.models import Count, Exists, OuterRef, Q, Subquery
+
+from auths.models import User
+from core.db_router import replica_reads
+from .models import Task, Report
+from . import workers as report_workers
+
+
+def iter_user_batches(batch_size=500, incremental=False):
+    """
+        Yield lists of user ids, streaming the user table by primary key.
+
+        With `incremental` only users without a report, or with a task updated after
+        their last report, are returned. (Deleted tasks do not touch date_update, so a
+        full run is still needed from time to time.)
+    """
+    users = User.objects.all()
+    if incremental:
+        last_report = Report.objects.filter(user=OuterRef('pk')).order_by('-date_generation').values('date_generation')[:1]
+        users = users.annotate(last_report=Subquery(last_report)).filter(
+            Q(last_report__isnull=True) |
+            Exists(Task.objects.filter(user=OuterRef('pk'), date_update__gt=OuterRef('last_report')))
+        )
+    last_id = 0
+    while True:
+        ids = list(users.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return
+        last_id = ids[-1]
+        yield ids
+
+
+def build_reports(user_ids, initial_period, end_period):
+    """
+        Create (or replace) one Report per user of the batch from a single grouped query
+        (tasks per user and category). Returns the number of reports written.
+    """
+    with replica_reads():
+        rows = list(
+            Task.objects
+            .filter(user_id__in=user_ids, date_creation__date__range=(initial_period, end_period))
+            .values('user_id', 'category__name')
+            .annotate(total=Count('id'), concluded=Count('id', filter=Q(status='CONCLUIDA')))
+            .order_by()
+        )
+    summary = {user_id: {"total": 0, "concluded": 0, "categories": []} for user_id in user_ids}
+    for row in rows:
+        user = summary[row['user_id']]
+        user["total"] += row['total']
+        user["concluded"] += row['concluded']
+        user["categories"].append({
+            "name": row['category__name'] or 'Sem categoria',
+            "total": row['total'],
+            "concluded": row['concluded'],
+        })
+
+    reports = []
+    for user_id, user in summary.items():
+        percentage = Decimal(user["concluded"] * 100) / user["total"] if user["total"] else Decimal(0)
+        reports.append(Report(
+            user_id=user_id,
+            initial_period=initial_period.isoformat(),
+            end_period=end_period.isoformat(),
+            total_task=user["total"],
+            concluded_task=percentage.quantize(Decimal('0.01')),
+            resume={"categories": user["categories"]},
+        ))
+    # Running the same period again replaces the reports instead of adding duplicates
+    Report.objects.bulk_create(
+        reports,
+        update_conflicts=True,
+        unique_fields=['user', 'initial_period', 'end_period'],
+        update_fields=['total_task', 'concluded_task', 'resume', 'date_generation'],
+    )
+    return len(reports)
+
+
+def generate_reports(initial_period, end_period, workers=1, batch_size=500, incremental=False):
+    """
+        Generate reports for every user (or only changed users with `incremental`).
+        Batches are processed inline with one worker, or fanned out over a process pool.
+        Tasks and users are read from the replica when one is configured.
+    """
+    with replica_reads():
+        return _generate_reports(initial_period, end_period, workers, batch_size, incremental)
+
+
+def _generate_reports(initial_period, end_period, workers, batch_size, incremental):
+    batches = iter_user_batches(batch_size=batch_size, incremental=incremental)
+    if workers <= 1:
+        return sum(build_reports(ids, initial_period, end_period) for ids in batches)
+
+    total = 0
+    # Spawned (not forked) processes set Django up and open their own database connections
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=report_workers.setup) as executor:
+        pending = set()
+        for ids in batches:
+            pending.add(executor.submit(report_workers.build_reports, ids, initial_period, end_period))
+            # Bound the number of batches in flight so memory stays flat
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                total += sum(future.result() for future in done)
+        total += sum(future.result() for future in wait(pending).done)
+    return total
@@ -1,4 +1,42 @@
-from .models import Task
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import BooleanField, Case, DurationField, ExpressionWrapper, F, Q, Value, When
+from django.utils import timezone
+from .models import Task, Progress, Category
+from core.pagination import keyset_page, akeyset_page, after_position
+from django.conf import settings
+from core.cache import bump_dashboard_version, RepositoryCache
+from . import search
+
+ACTIVE_STATUSES = ['PENDENTE', 'EM_ANDAMENTO']
+# Where the nightly sweep moves open tasks whose deadline passed
+EXPIRED_STATUS = 'CANCELADA'
+
+task_cache = RepositoryCache('task')
+category_cache = RepositoryCache('categories')
+
+
+def invalidate_cached_tasks(ids):
+    """
+        Forget cached tasks changed by a write. Done right away, for reads later in the same
+        transaction, and again once it commits: a lookup made by another request in between
+        still saw the old row and may have cached it.
+    """
+    if getattr(settings, 'REPOSITORY_CACHE_ENABLED', False):
+        ids = list(ids)
+        task_cache.invalidate(*ids)
+        transaction.on_commit(lambda: task_cache.invalidate(*ids))
+
+
+def invalidate_cached_categories(user_id):
+    if getattr(settings, 'REPOSITORY_CACHE_ENABLED', False) and user_id is not None:
+        category_cache.invalidate(user_id)
+        transaction.on_commit(lambda: category_cache.invalidate(user_id))
+
+
+def bump_dashboard_on_commit(user_id):
+    """ Bump the user's dashboard once the write is visible, so it is not rebuilt from the old rows """
+    transaction.on_commit(lambda: bump_dashboard_version(user_id))
 
 
 class TaskRepository:
@@ -22,6 +60,64 @@ class TaskRepository:
     
     def getTaskFilter(self, user): return self.__model.objects.filter(user=user).order_by('-date_creation')
     
+    def withDueDate(self, queryset, today=None):
+        """
+            Annotate `days_remaining` (timedelta, `.days` in templates) and `is_overdue`,
+            both computed by the database relative to today.
+        """
+        today = today or timezone.localdate()
+        return queryset.annotate(
+            days_remaining=ExpressionWrapper(F('date_expired') - Value(today), output_field=DurationField()),
+            is_overdue=Case(When(date_expired__lt=today, then=Value(True)), default=Value(False), output_field=BooleanField()),
+        )
+    
+    def getTaskPageQuery(self, user, status=None, priority=None, category=None, due_within=None, order='recent'):
+        """
+            Filtered tasks of the user and the keyset of their order, for getTaskPage/agetTaskPage.
+            order='recent': newest first, keyset on (date_creation, id).
+            order='urgency': nearest deadline first, keyset on (date_expired, id); tasks without deadline are left out.
+            due_within=N: only tasks due from today up to N days ahead (overdue ones included).
+        """
+        queryset = self.withDueDate(self.__model.objects.filter(user=user).select_related('category'))
+        if status: queryset = queryset.filter(status__in=status)
+        if priority: queryset = queryset.filter(priority__in=priority)
+        if category: queryset = queryset.filter(category_id=category)
+        if due_within is not None:
+            queryset = queryset.filter(date_expired__lte=timezone.localdate() + timedelta(days=due_within))
+        if order == 'urgency':
+            return queryset.filter(date_expired__isnull=False), 'date_expired', False
+        return queryset, 'date_creation', True
+    
+    def getTaskPage(self, user, cursor=None, limit=20, **filters):
+        """
+            Page of user tasks, filtered in the database so old or finished tasks are never loaded.
+            Returns (tasks, next_cursor).
+        """
+        queryset, field, descending = self.getTaskPageQuery(user, **filters)
+        return keyset_page(queryset, field, cursor=cursor, limit=limit, descending=descending)
+    
+    async def agetTaskPage(self, user, cursor=None, limit=20, **filters):
+        queryset, field, descending = self.getTaskPageQuery(user, **filters)
+        return await akeyset_page(queryset, field, cursor=cursor, limit=limit, descending=descending)
+    
+    def searchTasks(self, user, text, page=1, limit=20):
+        """
+            Tasks of the user matching `text`, best match first.
+            Returns (tasks, has_next) for the 1-based `page`.
+        """
+        offset = (page - 1) * limit
+        ids = search.search_task_ids(user.pk, text, limit=limit + 1, offset=offset)
+        if ids is None:
+            # Database without search index: plain substring match, newest first
+            queryset = self.__model.objects.filter(user=user).filter(
+                Q(title__icontains=text) | Q(description__icontains=text) | Q(category__name__icontains=text)
+            ).order_by('-date_creation', '-id')
+            tasks = list(self.withDueDate(queryset.select_related('category'))[offset:offset + limit + 1])
+        else:
+            found = self.withDueDate(self.__model.objects.filter(user=user, id__in=ids).select_related('category')).in_bulk()
+            tasks = [found[pk] for pk in ids if pk in found]
+        return tasks[:limit], len(tasks) > limit
+    
     def getTaskById(self, id:int):
         try:
             task = self.__model.objects.get(id=id)
@@ -29,6 +125,28 @@ class TaskRepository:
         except self.__model.DoesNotExist:
             print("Error, Task with this Id not exist!")
             return None
+    
+    async def acreate_task(self, title, description, category, date_expired, priority, status, user):
+        return await self.__model.objects.acreate(
+            title=title,
+            description=description,
+            category=category,
+            date_expired=date_expired,
+            priority=priority,
+            status=status,
+            user=user
+        )
+    
+    def getUserTask(self, user, id:int):
+        """ Task `id` if it belongs to `user`, else None """
+        return self.__model.objects.filter(user=user, id=id).select_related('category').first()
+    
+    async def agetUserTask(self, user, id:int):
+        """ Task `id` if it belongs to `user`, else None """
+        return await self.__model.objects.filter(user=user, id=id).select_related('category').afirst()
+    
+    def getUserCategories(self, user): return Category.objects.filter(user=user)
+    
     def getTaskByTitle(self, title): return self.__model.objects.get(title=title)
     
     def updateTaskById(self, user, form):
@@ -56,4 +174,96 @@ class TaskRepository:
         except self.__model.DoesNotExist:
             print('Error, Task with this id not exist!')
             return None
-        
\ No newline at end of file
+    
+    def concludeExpiredChunk(self, today, position=None, chunk_size=1000):
+        """
+            Close up to `chunk_size` tasks whose deadline passed, with one UPDATE: concluded=True,
+            and open ones (ACTIVE_STATUSES) move to EXPIRED_STATUS. Walks the partial
+            (date_expired, id) index of not concluded tasks with a keyset cursor, so each chunk
+            starts where the previous one stopped and concluded tasks are never read.
+            Returns (rows, next position): the (id, user, category, status, priority) rows as
+            they were before, so the caller can move the counters. No rows means done.
+        """
+        rows = list(
+            after_position(self.__model.objects.filter(date_expired__lt=today, concluded=False), 'date_expired', position)
+            .values_list('id', 'user_id', 'category_id', 'status', 'priority', 'date_expired')[:chunk_size]
+        )
+        if not rows:
+            return [], position
+        position = (rows[-1][5], rows[-1][0])
+        ids = [row[0] for row in rows]
+        self.__model.objects.filter(id__in=ids, concluded=False).update(
+            concluded=True,
+            status=Case(When(status__in=ACTIVE_STATUSES, then=Value(EXPIRED_STATUS)), default=F('status')),
+            date_update=timezone.now(),
+        )
+        invalidate_cached_tasks(ids)
+        # update() skips post_save, so invalidate the dashboards here
+        for user_id in {row[1] for row in rows}:
+            bump_dashboard_on_commit(user_id)
+        return [row[:5] for row in rows], position
+    
+    def iterDueTasks(self, start, end, statuses, chunk_size=1000):
+        """
+            Yield chunks of (id, user_id, title, date_expired) for open tasks due between start and end.
+        """
+        last_id = 0
+        while True:
+            rows = list(
+                self.__model.objects
+                .filter(date_expired__range=(start, end), status__in=statuses, concluded=False, user__isnull=False, id__gt=last_id)
+                .order_by('id')
+                .values_list('id', 'user_id', 'title', 'date_expired')[:chunk_size]
+            )
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            yield rows
+    
+    def bulkUpdateStatus(self, user, ids, status):
+        """
+            Move many tasks of the user to `status` with one UPDATE.
+            Returns the (id, user, category, status, priority) rows as they were before,
+            so the caller can move the counters.
+        """
+        rows = list(
+            self.__model.objects.filter(user=user, id__in=ids)
+            .values_list('id', 'user_id', 'category_id', 'status', 'priority')
+        )
+        if rows:
+            self.__model.objects.filter(id__in=[row[0] for row in rows]).update(status=status, date_update=timezone.now())
+            invalidate_cached_tasks([row[0] for row in rows])
+        return rows
+    
+    def upsertProgress(self, percentages):
+        """
+            Create or update the Progress of many tasks with one INSERT ... ON CONFLICT.
+            `percentages` maps task id -> percentage.
+        """
+        if not percentages:
+            return
+        Progress.objects.bulk_create(
+            [Progress(task_id=task_id, percentage=percentage) for task_id, percentage in percentages.items()],
+            update_conflicts=True,
+            unique_fields=['task'],
+            update_fields=['percentage', 'date_update'],
+            batch_size=500,
+        )
+
+
+class CachedTaskRepository(TaskRepository):
+    """
+        TaskRepository with task and category lookups served by RepositoryCache.
+        Enabled with settings.REPOSITORY_CACHE_ENABLED; writes are invalidated by task.signals.
+    """
+    def getTaskById(self, id:int):
+        load = super().getTaskById
+        return task_cache.get_or_load(id, lambda: load(id=id))
+    
+    def getUserTask(self, user, id:int):
+        task = self.getTaskById(id)
+        return task if task is not None and task.user_id == user.pk else None
+    
+    def getUserCategories(self, user):
+        load = super().getUserCategories
+        return category_cache.get_or_load(user.pk, lambda: list(load(user)))
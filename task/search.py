@@ -0,0 +1,140 @@
+"""
+    Full-text search over tasks (title, description and category name).
+
+    The index lives in the `task_search` table created by migration 0007:
+    a FTS5 virtual table on SQLite, a tsvector column with a GIN index on PostgreSQL.
+    Other databases fall back to icontains lookups on the task table.
+"""
+import re
+
+from django.db import connections, router
+
+from .models import Task
+
+# Text search configuration of PostgreSQL (UI and tasks are in Portuguese)
+POSTGRES_CONFIG = 'portuguese'
+
+# Relevance of each indexed column: title > description > category
+SQLITE_WEIGHTS = (10.0, 4.0, 2.0, 0.0)
+
+
+def get_backend(using=None):
+    """
+        'sqlite', 'postgresql' or None when the database has no search index.
+        `using` defaults to the alias the reads of Task are routed to.
+    """
+    vendor = connections[using or router.db_for_read(Task)].vendor
+    if vendor in ('sqlite', 'postgresql'):
+        return vendor
+    return None
+
+
+def get_terms(text):
+    """ Words of the user query; operators and punctuation are dropped """
+    return re.findall(r'\w+', text or '')[:20]
+
+
+def _placeholders(values):
+    return ', '.join(['%s'] * len(values))
+
+
+def index_tasks(task_ids):
+    """ (Re)write the index rows of the given tasks from the task/category tables """
+    task_ids = list(task_ids)
+    using = router.db_for_write(Task)
+    backend = get_backend(using)
+    if not task_ids or backend is None:
+        return
+    with connections[using].cursor() as cursor:
+        if backend == 'sqlite':
+            cursor.execute(f"DELETE FROM task_search WHERE rowid IN ({_placeholders(task_ids)})", task_ids)
+            cursor.execute(
+                f"""INSERT INTO task_search (rowid, title, description, category, owner)
+                SELECT t.id, t.title, COALESCE(t.description, ''), COALESCE(c.name, ''), 'u' || t.user_id
+                FROM task t LEFT JOIN category c ON c.id = t.category_id
+                WHERE t.id IN ({_placeholders(task_ids)})""",
+                task_ids,
+            )
+        else:
+            cursor.execute(
+                """INSERT INTO task_search (task_id, user_id, document)
+                SELECT t.id, t.user_id,
+                    setweight(to_tsvector(%s, t.title), 'A') ||
+                    setweight(to_tsvector(%s, COALESCE(t.description, '')), 'B') ||
+                    setweight(to_tsvector(%s, COALESCE(c.name, '')), 'C')
+                FROM task t LEFT JOIN category c ON c.id = t.category_id
+                WHERE t.id = ANY(%s)
+                ON CONFLICT (task_id) DO UPDATE SET user_id = EXCLUDED.user_id, document = EXCLUDED.document""",
+                [POSTGRES_CONFIG, POSTGRES_CONFIG, POSTGRES_CONFIG, task_ids],
+            )
+
+
+def remove_tasks(task_ids):
+    """ Drop the index rows of deleted tasks """
+    task_ids = list(task_ids)
+    using = router.db_for_write(Task)
+    backend = get_backend(using)
+    if not task_ids or backend is None:
+        return
+    with connections[using].cursor() as cursor:
+        if backend == 'sqlite':
+            cursor.execute(f"DELETE FROM task_search WHERE rowid IN ({_placeholders(task_ids)})", task_ids)
+        else:
+            cursor.execute("DELETE FROM task_search WHERE task_id = ANY(%s)", [task_ids])
+
+
+def index_all(chunk_size=1000):
+    """ Rebuild the whole index, `chunk_size` tasks at a time. Returns the number of tasks indexed. """
+    using = router.db_for_write(Task)
+    backend = get_backend(using)
+    if backend is None:
+        return 0
+    total, last_id = 0, 0
+    while True:
+        with connections[using].cursor() as cursor:
+            cursor.execute("SELECT id FROM task WHERE id > %s ORDER BY id LIMIT %s", [last_id, chunk_size])
+            ids = [row[0] for row in cursor.fetchall()]
+        if not ids:
+            break
+        index_tasks(ids)
+        total += len(ids)
+        last_id = ids[-1]
+    with connections[using].cursor() as cursor:
+        # Rows of tasks removed without signals (ex: raw deletes)
+        if backend == 'sqlite':
+            cursor.execute("DELETE FROM task_search WHERE rowid NOT IN (SELECT id FROM task)")
+        else:
+            cursor.execute("DELETE FROM task_search s WHERE NOT EXISTS (SELECT 1 FROM task t WHERE t.id = s.task_id)")
+    return total
+
+
+def search_task_ids(user_id, text, limit=20, offset=0):
+    """
+        Ids of the user's tasks matching every word of `text` (as prefixes),
+        best match first. Returns None when the database has no search index.
+    """
+    terms = get_terms(text)
+    using = router.db_for_read(Task)
+    backend = get_backend(using)
+    if backend is None:
+        return None
+    if not terms:
+        return []
+    with connections[using].cursor() as cursor:
+        if backend == 'sqlite':
+            match = 'owner:u%d AND {title description category}:(%s)' % (
+                user_id, ' '.join(f'"{term}"*' for term in terms)
+            )
+            cursor.execute(
+                f"""SELECT rowid FROM task_search WHERE task_search MATCH %s
+                ORDER BY bm25(task_search, {', '.join(map(str, SQLITE_WEIGHTS))}), rowid LIMIT %s OFFSET %s""",
+                [match, limit, offset],
+            )
+        else:
+            cursor.execute(
+                """SELECT task_id FROM task_search, to_tsquery(%s, %s) AS query
+                WHERE user_id = %s AND document @@ query
+                ORDER BY ts_rank(document, query) DESC, task_id LIMIT %s OFFSET %s""",
+                [POSTGRES_CONFIG, ' & '.join(f'{term}:*' for term in terms), user_id, limit, offset],
+            )
+        return [row[0] for row in cursor.fetchall()]
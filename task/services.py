@@ -1,12 +1,164 @@
-from .repository import TaskRepository
-from .models import Task
+from collections import Counter, defaultdict
+from datetime import datetime, time, timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .repository import TaskRepository, CachedTaskRepository, ACTIVE_STATUSES, EXPIRED_STATUS, invalidate_cached_tasks, bump_dashboard_on_commit
+from .models import Task, Notification, Tombstone, PROGRESS_BY_STATUS
+from .signals import muted_task_signals, publish_progress, publish_notifications
+from .stats import apply_stat_deltas
+from . import search
 
 
 class TaskService:
     def __init__(self, repository=None):
         if repository is None:
-            self.__repository = TaskRepository(Task)
+            repository_class = CachedTaskRepository if settings.REPOSITORY_CACHE_ENABLED else TaskRepository
+            self.__repository = repository_class(Task)
         else:
             self.__repository = repository
             
-    def getRepository(self): return self.__repository
\ No newline at end of file
+    def getRepository(self): return self.__repository
+    
+    def sweepSchedules(self, today=None, remind_days=1, chunk_size=1000):
+        """
+            Nightly job: close expired tasks (see concludeExpiredTasks), create LEMBRETE notifications
+            for open tasks due in the next `remind_days` days (at most one per task per day)
+            and purge tombstones older than settings.SYNC_TOMBSTONE_DAYS.
+            Work is done in chunks of `chunk_size` rows so memory does not grow with the table.
+        """
+        today = today or timezone.localdate()
+        concluded = self.concludeExpiredTasks(today, chunk_size=chunk_size)
+        
+        # Reminders already sent today (real date, even when `today` is overridden)
+        start_of_day = timezone.make_aware(datetime.combine(timezone.localdate(), time.min))
+        reminders = 0
+        for rows in self.__repository.iterDueTasks(today, today + timedelta(days=remind_days), ACTIVE_STATUSES, chunk_size=chunk_size):
+            already_sent = set(
+                Notification.objects
+                .filter(task_id__in=[row[0] for row in rows], type='LEMBRETE', date_send__gte=start_of_day)
+                .values_list('task_id', flat=True)
+            )
+            notifications = [
+                Notification(
+                    user_id=user_id,
+                    task_id=task_id,
+                    type='LEMBRETE',
+                    message=f'Lembrete: a tarefa "{title}" vence em {date_expired:%d/%m/%Y}.',
+                )
+                for task_id, user_id, title, date_expired in rows if task_id not in already_sent
+            ]
+            Notification.objects.bulk_create(notifications, batch_size=chunk_size)
+            publish_notifications(notifications)
+            reminders += len(notifications)
+        
+        limit = timezone.now() - timedelta(days=getattr(settings, 'SYNC_TOMBSTONE_DAYS', 30))
+        purged = 0
+        while True:
+            ids = list(Tombstone.objects.filter(date_deleted__lt=limit).values_list('id', flat=True)[:chunk_size])
+            if not ids:
+                break
+            purged += Tombstone.objects.filter(id__in=ids).delete()[0]
+        return {"concluded": concluded, "reminders": reminders, "tombstones": purged}
+    
+    def concludeExpiredTasks(self, today, chunk_size=1000):
+        """
+            Close every task whose deadline passed, chunk by chunk, each chunk in its own
+            transaction with the counter moves of the tasks that changed status.
+            Returns the number of tasks closed.
+        """
+        total, position = 0, None
+        while True:
+            with transaction.atomic():
+                rows, position = self.__repository.concludeExpiredChunk(today, position, chunk_size=chunk_size)
+                deltas = Counter()
+                changes = defaultdict(list)
+                for task_id, user_id, category_id, status, priority in rows:
+                    if status in ACTIVE_STATUSES:
+                        deltas[(user_id, category_id, status, priority)] -= 1
+                        deltas[(user_id, category_id, EXPIRED_STATUS, priority)] += 1
+                        changes[user_id].append({"id": task_id, "status": EXPIRED_STATUS})
+                apply_stat_deltas(deltas)
+            if not rows:
+                return total
+            total += len(rows)
+            for user_id, user_changes in changes.items():
+                publish_progress(user_id, user_changes)
+    
+    def bulkSync(self, user, creates=(), updates=(), delete_ids=()):
+        """
+            Apply many task changes of one user in a single transaction.
+            
+            creates: dicts of Task fields
+            updates: tasks loaded from the database with their new values already set
+            delete_ids: ids of tasks of the user to delete
+            
+            Rows are written with bulk_create/bulk_update; progress, counters, the
+            search index and the dashboard cache are then updated once for the whole
+            batch, with the same result as the per-row signals. Returns (created_tasks, deleted_ids).
+        """
+        deltas = Counter()
+        percentages = {}
+        with transaction.atomic(), muted_task_signals():
+            created = self.__repository.getModel().objects.bulk_create(
+                [Task(user=user, **data) for data in creates], batch_size=500
+            )
+            for task in created:
+                deltas[task.get_stat_key()] += 1
+            
+            if updates:
+                now = timezone.now()
+                for task in updates:
+                    deltas[task._loaded_stat_key] -= 1
+                    deltas[task.get_stat_key()] += 1
+                    task.date_update = now
+                fields = ['title', 'description', 'category', 'date_expired', 'priority', 'status', 'progress_points', 'date_update']
+                self.__repository.getModel().objects.bulk_update(updates, fields, batch_size=500)
+            
+            deleted_ids = []
+            if delete_ids:
+                rows = self.__repository.getModel().objects.filter(user=user, id__in=delete_ids)
+                for task_id, *key in rows.values_list('id', 'user_id', 'category_id', 'status', 'priority'):
+                    deleted_ids.append(task_id)
+                    deltas[tuple(key)] -= 1
+                self.__repository.getModel().objects.filter(id__in=deleted_ids).delete()
+                Tombstone.objects.bulk_create([Tombstone(user=user, model='task', object_id=task_id) for task_id in deleted_ids])
+            
+            for task in [*created, *updates]:
+                if task.status in PROGRESS_BY_STATUS:
+                    percentages[task.id] = PROGRESS_BY_STATUS[task.status]
+            self.__repository.upsertProgress(percentages)
+            apply_stat_deltas(deltas)
+            search.index_tasks([task.id for task in [*created, *updates]])
+            search.remove_tasks(deleted_ids)
+            invalidate_cached_tasks([*[task.id for task in updates], *deleted_ids])
+        
+        for task in updates:
+            task._loaded_stat_key = task.get_stat_key()
+            task.snapshot_fields()
+        bump_dashboard_on_commit(user.pk)
+        publish_progress(user.pk, [
+            {"id": task.id, "status": task.status, "progress_points": task.progress_points}
+            for task in [*created, *updates]
+        ])
+        return created, deleted_ids
+    
+    def changeStatus(self, user, ids, status):
+        """
+            Set-based status transition of many tasks: one UPDATE, one Progress upsert
+            and one counter update per distinct (status, priority), with the same
+            derived state as saving each task. Returns the number of tasks changed.
+        """
+        with transaction.atomic():
+            rows = self.__repository.bulkUpdateStatus(user, ids, status)
+            if status in PROGRESS_BY_STATUS:
+                self.__repository.upsertProgress({row[0]: PROGRESS_BY_STATUS[status] for row in rows})
+            deltas = Counter()
+            for task_id, user_id, category_id, old_status, priority in rows:
+                deltas[(user_id, category_id, old_status, priority)] -= 1
+                deltas[(user_id, category_id, status, priority)] += 1
+            apply_stat_deltas(deltas)
+        if rows:
+            bump_dashboard_on_commit(user.pk)
+            publish_progress(user.pk, [{"id": row[0], "status": status} for row in rows])
+        return len(rows)
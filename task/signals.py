@@ -1,16 +1,152 @@
-from django.db.models.signals import post_save
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
-from models import Task, Progress
+from django.conf import settings
+from core import events
+from auths.models import User
+from .models import Task, Progress, Category, Notification, Tombstone, PROGRESS_BY_STATUS
+from .stats import apply_stat_delta
+from . import search
+from .repository import invalidate_cached_tasks, invalidate_cached_categories, bump_dashboard_on_commit
+
+_muted = ContextVar('task_signals_muted', default=False)
+
+
+@contextmanager
+def muted_task_signals():
+    """
+        Skip the per-row Task handlers below. Only for bulk code paths that
+        apply the same derived state (progress, counters, dashboard) set-based themselves.
+    """
+    token = _muted.set(True)
+    try:
+        yield
+    finally:
+        _muted.reset(token)
+
+
+def publish_progress(user_id, changes):
+    """
+        Push task changes ({"id", "status", "progress_points"} dicts) to the open dashboards
+        of the user. Large batches send a single "refresh" instead of one event per task.
+    """
+    if len(changes) > settings.EVENTS_BATCH_LIMIT:
+        events.publish(user_id, 'refresh', {})
+        return
+    for change in changes:
+        events.publish(user_id, 'progress', change)
+
+
+def publish_notifications(notifications):
+    for notification in notifications:
+        events.publish(notification.user_id, 'notification', {
+            "id": notification.pk,
+            "task": notification.task_id,
+            "type": notification.type,
+            "message": notification.message,
+        })
 
 
 @receiver(post_save, sender=Task)
 def update_progress(sender, instance, **kwargs):
-    if instance.status == 'CONCLUIDA':
-        progress, created = Progress.objects.get_or_create(task=instance)
-        progress.percentage = 100
-        progress.save()
-        
-    elif instance.status == 'PENDENTE':
-        progress, created = Progress.objects.get_or_create(task=instance)
-        progress.percentage = 0
-        progress.save()
\ No newline at end of file
+    if _muted.get() or instance.status not in PROGRESS_BY_STATUS:
+        return
+    progress, created = Progress.objects.get_or_create(task=instance)
+    progress.percentage = PROGRESS_BY_STATUS[instance.status]
+    progress.save()
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_dashboard(sender, instance, **kwargs):
+    """ Any change on tasks or categories makes the cached dashboard (and repository lookups) of its owner stale """
+    if sender is Task and _muted.get():
+        return
+    bump_dashboard_on_commit(instance.user_id)
+    if sender is Task:
+        invalidate_cached_tasks([instance.pk])
+    else:
+        invalidate_cached_categories(instance.user_id)
+
+
+@receiver(pre_save, sender=Task)
+def remember_stat_key(sender, instance, **kwargs):
+    if _muted.get():
+        return
+    # Instance not loaded through the ORM (ex: built with a pk): read what is stored
+    if instance.pk and not hasattr(instance, '_loaded_stat_key'):
+        old = Task.objects.filter(pk=instance.pk).first()
+        instance._loaded_stat_key = old.get_stat_key() if old else None
+
+
+@receiver(post_save, sender=Task)
+def update_task_stats(sender, instance, created, **kwargs):
+    """ Move the user/category counters from the old (status, priority, ...) to the new one """
+    if _muted.get():
+        return
+    old_key = None if created else getattr(instance, '_loaded_stat_key', None)
+    new_key = instance.get_stat_key()
+    if old_key == new_key:
+        return
+    if old_key:
+        apply_stat_delta(old_key, -1)
+    apply_stat_delta(new_key, 1)
+
+
+@receiver(post_delete, sender=Task)
+def remove_task_stats(sender, instance, **kwargs):
+    if _muted.get():
+        return
+    apply_stat_delta(getattr(instance, '_loaded_stat_key', None) or instance.get_stat_key(), -1)
+
+
+@receiver(post_delete, sender=Task)
+@receiver(post_delete, sender=Category)
+def record_tombstone(sender, instance, origin=None, **kwargs):
+    """ Keep the id of deleted rows so delta sync clients can drop them """
+    if instance.user_id is None or (sender is Task and _muted.get()):
+        return
+    # Deleting the user removes the tombstones as well
+    if isinstance(origin, User) or getattr(origin, 'model', None) is User:
+        return
+    Tombstone.objects.create(user_id=instance.user_id, model=sender._meta.model_name, object_id=instance.pk)
+
+
+@receiver(post_save, sender=Task)
+def index_task(sender, instance, **kwargs):
+    if _muted.get():
+        return
+    search.index_tasks([instance.pk])
+
+
+@receiver(post_delete, sender=Task)
+def unindex_task(sender, instance, **kwargs):
+    if _muted.get():
+        return
+    search.remove_tasks([instance.pk])
+
+
+@receiver(post_save, sender=Category)
+def reindex_category_tasks(sender, instance, created, **kwargs):
+    """ The category name is part of the search document of its tasks """
+    if created:
+        return
+    search.index_tasks(Task.objects.filter(category=instance).values_list('id', flat=True))
+
+
+@receiver(post_save, sender=Task)
+def push_task_progress(sender, instance, **kwargs):
+    if _muted.get():
+        return
+    publish_progress(instance.user_id, [
+        {"id": instance.pk, "status": instance.status, "progress_points": instance.progress_points},
+    ])
+
+
+@receiver(post_save, sender=Notification)
+def push_notification(sender, instance, created, **kwargs):
+    if created:
+        publish_notifications([instance])
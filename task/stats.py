@@ -0,0 +1,90 @@
+from collections import Counter
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+
+from .models import Task, UserTaskStat, CategoryTaskStat, STATUS_CHOICES
+
+
+def _add(model, delta, **key):
+    """ count += delta on one counter row, creating the row the first time """
+    if model.objects.filter(**key).update(count=F('count') + delta) or delta < 0:
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(count=delta, **key)
+    except IntegrityError:
+        # Another transaction created the row first
+        model.objects.filter(**key).update(count=F('count') + delta)
+
+
+def apply_stat_delta(stat_key, delta):
+    """
+        Move the counters of a Task.get_stat_key() tuple (user, category, status, priority) by delta.
+    """
+    user_id, category_id, status, priority = stat_key
+    if user_id is not None:
+        _add(UserTaskStat, delta, user_id=user_id, status=status, priority=priority)
+    if category_id is not None:
+        _add(CategoryTaskStat, delta, category_id=category_id, status=status, priority=priority)
+
+
+def apply_stat_deltas(deltas):
+    """
+        Set-based version of apply_stat_delta for bulk changes: `deltas` maps stat keys
+        to +n/-n and only one UPDATE per distinct counter row is issued.
+    """
+    users, categories = Counter(), Counter()
+    for (user_id, category_id, status, priority), delta in deltas.items():
+        if user_id is not None:
+            users[(user_id, status, priority)] += delta
+        if category_id is not None:
+            categories[(category_id, status, priority)] += delta
+    for (user_id, status, priority), delta in users.items():
+        if delta: _add(UserTaskStat, delta, user_id=user_id, status=status, priority=priority)
+    for (category_id, status, priority), delta in categories.items():
+        if delta: _add(CategoryTaskStat, delta, category_id=category_id, status=status, priority=priority)
+
+
+def get_user_status_counts(user):
+    """ Tasks of the user per status, read from the counters (ex: {'PENDENTE': 3, ...}) """
+    counts = {status: 0 for status, label in STATUS_CHOICES}
+    rows = UserTaskStat.objects.filter(user=user).values('status').annotate(total=Sum('count')).order_by()
+    for row in rows:
+        counts[row['status']] = row['total']
+    return counts
+
+
+async def aget_user_status_counts(user):
+    counts = {status: 0 for status, label in STATUS_CHOICES}
+    rows = UserTaskStat.objects.filter(user=user).values('status').annotate(total=Sum('count')).order_by()
+    async for row in rows:
+        counts[row['status']] = row['total']
+    return counts
+
+
+def rebuild_user_stats(user_ids):
+    """ Recompute from the task table the counters of the given users """
+    with transaction.atomic():
+        UserTaskStat.objects.filter(user_id__in=user_ids).delete()
+        rows = (
+            Task.objects.filter(user_id__in=user_ids)
+            .values('user_id', 'status', 'priority').annotate(total=Count('id')).order_by()
+        )
+        UserTaskStat.objects.bulk_create([
+            UserTaskStat(user_id=row['user_id'], status=row['status'], priority=row['priority'], count=row['total'])
+            for row in rows
+        ])
+
+
+def rebuild_category_stats(category_ids):
+    """ Recompute from the task table the counters of the given categories """
+    with transaction.atomic():
+        CategoryTaskStat.objects.filter(category_id__in=category_ids).delete()
+        rows = (
+            Task.objects.filter(category_id__in=category_ids)
+            .values('category_id', 'status', 'priority').annotate(total=Count('id')).order_by()
+        )
+        CategoryTaskStat.objects.bulk_create([
+            CategoryTaskStat(category_id=row['category_id'], status=row['status'], priority=row['priority'], count=row['total'])
+            for row in rows
+        ])
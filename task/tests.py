@@ -1,3 +1,528 @@
-from django.test import TestCase
+import gzip
+import importlib
+import io
+import json
+import logging
+from datetime import date, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.handlers.asgi import ASGIHandler
+from django.test import TestCase, AsyncClient, override_settings
+from django.urls import clear_url_caches, reverse
+from django.utils import timezone
+
+from auths.models import User
+from core.cache import get_dashboard_version
+from . import search
+from .importer import import_tasks, iter_rows, iter_json_rows
+from .models import PROGRESS_BY_STATUS, Task, Progress, Report, Category, Notification, Tombstone, UserTaskStat, CategoryTaskStat
+from .reports import generate_reports
+from .services import TaskService
+from .stats import get_user_status_counts, rebuild_user_stats, rebuild_category_stats
+from .repository import TaskRepository, CachedTaskRepository, task_cache
+
+
+def reload_urlconfs():
+    for module in ('task.urls', 'core.urls', 'TodoApp.urls'):
+        importlib.reload(importlib.import_module(module))
+    clear_url_caches()
+
+
+class TaskOwnerTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='dono', email='dono@mail.com', password='senha12345')
+        self.other = User.objects.create_user(username='outro', email='outro@mail.com', password='senha12345')
+        self.task = Task.objects.create(title='Minha', user=self.owner)
+        self.client.force_login(self.other)
+
+    def test_update_of_another_users_task_is_not_found(self):
+        self.assertEqual(self.client.get(reverse('task_update', args=[self.task.pk])).status_code, 404)
+        response = self.client.post(reverse('task_update', args=[self.task.pk]), {'title': 'Roubada', 'priority': 'ALTA', 'status': 'PENDENTE'})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(Task.objects.get(pk=self.task.pk).title, 'Minha')
+
+    def test_delete_of_another_users_task_is_refused(self):
+        self.assertEqual(self.client.get(reverse('task_delete', args=[self.task.pk])).status_code, 404)
+        self.client.post(reverse('task_delete', args=[self.task.pk]))
+        self.assertTrue(Task.objects.filter(pk=self.task.pk).exists())
+
+
+class TaskPageTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='pagina', email='pagina@mail.com', password='senha12345')
+        today = date.today()
+        self.tasks = [
+            Task.objects.create(title=f'Tarefa {index}', user=self.user, date_expired=today + timedelta(days=index % 4))
+            for index in range(25)
+        ]
+        # Same creation time for all: pages are told apart by id
+        Task.objects.filter(user=self.user).update(date_creation=self.tasks[0].date_creation)
+        Task.objects.create(title='Tarefa encerrada', user=self.user, status='CONCLUIDA')
+        self.repository = TaskRepository(Task)
+
+    def walk(self, **filters):
+        ids, cursor = [], None
+        while True:
+            tasks, cursor = self.repository.getTaskPage(self.user, cursor=cursor, limit=10, **filters)
+            ids.extend(task.pk for task in tasks)
+            if not cursor:
+                return ids
+
+    def test_pages_cover_every_task_once(self):
+        ids = self.walk(status=['PENDENTE'])
+        self.assertEqual(ids, sorted((task.pk for task in self.tasks), reverse=True))
+
+    def test_urgency_order(self):
+        ids = self.walk(status=['PENDENTE'], order='urgency')
+        expected = sorted(self.tasks, key=lambda task: (task.date_expired, task.pk))
+        self.assertEqual(ids, [task.pk for task in expected])
+
+    def test_dashboard_follows_the_next_link(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, 'Tarefa 24')
+        self.assertNotContains(response, 'Tarefa encerrada')
+        next_query = response.content.decode().split('href="?', 1)[1].split('"', 1)[0].replace('&amp;', '&')
+        response = self.client.get(reverse('index') + '?' + next_query)
+        self.assertContains(response, 'Tarefa 0')
+        self.assertNotContains(response, 'Tarefa 24')
+
+
+class DueDateTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='prazo', email='prazo@mail.com', password='senha12345')
+        self.today = timezone.localdate()
+        self.tasks = {
+            offset: Task.objects.create(title=f'Prazo {offset}', user=self.user, date_expired=self.today + timedelta(days=offset))
+            for offset in (-1, 0, 1, 3, 10)
+        }
+        self.undated = Task.objects.create(title='Sem prazo', user=self.user)
+        self.repository = TaskRepository(Task)
+
+    def test_days_remaining_and_overdue(self):
+        tasks = self.repository.withDueDate(Task.objects.filter(user=self.user)).in_bulk()
+        for offset, task in self.tasks.items():
+            self.assertEqual(tasks[task.pk].days_remaining.days, offset)
+            self.assertEqual(tasks[task.pk].is_overdue, offset < 0)
+        self.assertIsNone(tasks[self.undated.pk].days_remaining)
+        self.assertFalse(tasks[self.undated.pk].is_overdue)
+        # Relative to the given day
+        task = self.repository.withDueDate(Task.objects.filter(pk=self.tasks[1].pk), today=self.today + timedelta(days=2)).get()
+        self.assertEqual((task.days_remaining.days, task.is_overdue), (-1, True))
+
+    def test_due_within_keeps_overdue_tasks(self):
+        def due(days):
+            queryset, field, descending = self.repository.getTaskPageQuery(self.user, due_within=days)
+            return sorted(task.title for task in queryset)
+        self.assertEqual(due(0), ['Prazo -1', 'Prazo 0'])
+        self.assertEqual(due(3), ['Prazo -1', 'Prazo 0', 'Prazo 1', 'Prazo 3'])
+        self.assertEqual(len(due(None)), 6)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='busca', email='busca@mail.com', password='senha12345')
+        self.other = User.objects.create_user(username='alheio', email='alheio@mail.com', password='senha12345')
+        self.repository = TaskRepository(Task)
+
+    def search(self, text, user=None, **kwargs):
+        tasks, has_next = self.repository.searchTasks(user or self.user, text, **kwargs)
+        return [task.title for task in tasks], has_next
+
+    def test_index_follows_task_writes(self):
+        task = Task.objects.create(title='Comprar pão', user=self.user)
+        self.assertEqual(self.search('comprar'), (['Comprar pão'], False))
+        task.title = 'Pagar contas'
+        task.save()
+        self.assertEqual(self.search('comprar'), ([], False))
+        self.assertEqual(self.search('contas'), (['Pagar contas'], False))
+        task.delete()
+        self.assertEqual(self.search('contas'), ([], False))
+
+    def test_category_rename_reindexes_its_tasks(self):
+        category = Category.objects.create(name='Casa', user=self.user)
+        Task.objects.create(title='Lavar louça', user=self.user, category=category)
+        self.assertEqual(self.search('casa'), (['Lavar louça'], False))
+        category.name = 'Limpeza'
+        category.save()
+        self.assertEqual(self.search('casa'), ([], False))
+        self.assertEqual(self.search('limpeza'), (['Lavar louça'], False))
+
+    def test_prefixes_match_and_title_ranks_first(self):
+        category = Category.objects.create(name='Mercado', user=self.user)
+        Task.objects.create(title='Lista', user=self.user, category=category)
+        Task.objects.create(title='Semana', description='Ir ao mercado', user=self.user)
+        Task.objects.create(title='Mercado da esquina', user=self.user)
+        Task.objects.create(title='Academia', user=self.user)
+        self.assertEqual(self.search('merc'), (['Mercado da esquina', 'Semana', 'Lista'], False))
+        # Every word must match
+        self.assertEqual(self.search('merc esq'), (['Mercado da esquina'], False))
+
+    def test_only_the_users_tasks_are_found(self):
+        Task.objects.create(title='Relatório mensal', user=self.user)
+        Task.objects.create(title='Relatório anual', user=self.other)
+        self.assertEqual(self.search('relat'), (['Relatório mensal'], False))
+        self.assertEqual(self.search('relat', user=self.other), (['Relatório anual'], False))
+
+    def test_pages(self):
+        for index in range(5):
+            Task.objects.create(title=f'Estudo {index}', user=self.user)
+        first, has_next = self.search('estudo', page=1, limit=2)
+        self.assertTrue(has_next)
+        second, has_next = self.search('estudo', page=2, limit=2)
+        self.assertTrue(has_next)
+        third, has_next = self.search('estudo', page=3, limit=2)
+        self.assertFalse(has_next)
+        self.assertEqual(sorted(first + second + third), [f'Estudo {index}' for index in range(5)])
+
+    def test_backend_of_the_read_database(self):
+        # The vendor is the one of the alias the query runs on, not of 'default'
+        replica = mock.Mock(vendor='mysql')
+        with mock.patch('task.search.router.db_for_read', return_value='replica'), \
+                mock.patch('task.search.connections', {'replica': replica}):
+            self.assertIsNone(search.search_task_ids(self.user.pk, 'estudo'))
+        replica.cursor.assert_not_called()
+
+
+class TaskStatsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='contador', email='contador@mail.com', password='senha12345')
+        self.casa = Category.objects.create(name='Casa', user=self.user)
+        self.trabalho = Category.objects.create(name='Trabalho', user=self.user)
+
+    def counters(self):
+        users = {(row.status, row.priority): row.count for row in UserTaskStat.objects.filter(user=self.user) if row.count}
+        categories = {
+            (row.category_id, row.status, row.priority): row.count
+            for row in CategoryTaskStat.objects.filter(category__user=self.user) if row.count
+        }
+        return users, categories
+
+    def assertCountersMatchTheTasks(self):
+        kept = self.counters()
+        rebuild_user_stats([self.user.pk])
+        rebuild_category_stats([self.casa.pk, self.trabalho.pk])
+        self.assertEqual(kept, self.counters())
+
+    def test_counters_follow_every_kind_of_write(self):
+        tasks = [Task.objects.create(title=f'Tarefa {index}', user=self.user, category=self.casa) for index in range(4)]
+        self.assertEqual(get_user_status_counts(self.user)['PENDENTE'], 4)
+
+        tasks[0].status = 'CONCLUIDA'
+        tasks[0].save()
+        tasks[1].category = self.trabalho
+        tasks[1].priority = 'ALTA'
+        tasks[1].save()
+        tasks[2].delete()
+        self.assertCountersMatchTheTasks()
+
+        TaskService().changeStatus(self.user, [tasks[1].pk, tasks[3].pk], 'EM_ANDAMENTO')
+        TaskService().bulkSync(
+            self.user,
+            creates=[{"title": "Em lote", "category": self.trabalho}],
+            delete_ids=[tasks[3].pk],
+        )
+        self.assertCountersMatchTheTasks()
+        self.assertEqual(get_user_status_counts(self.user), {'PENDENTE': 1, 'EM_ANDAMENTO': 1, 'CONCLUIDA': 1, 'CANCELADA': 0})
+
+
+class ChangeStatusTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.user = User.objects.create_user(username='estado', email='estado@mail.com', password='senha12345')
+        self.other = User.objects.create_user(username='outro', email='outro@mail.com', password='senha12345')
+        self.tasks = [Task.objects.create(title=f'Tarefa {index}', user=self.user) for index in range(3)]
+        self.foreign = Task.objects.create(title='Alheia', user=self.other)
+
+    def change(self, ids, status):
+        with self.captureOnCommitCallbacks(execute=True):
+            return TaskService().changeStatus(self.user, ids, status)
+
+    def percentages(self):
+        return dict(Progress.objects.values_list('task_id', 'percentage'))
+
+    def test_progress_follows_the_status_map(self):
+        ids = [task.pk for task in self.tasks[:2]]
+        self.assertEqual(self.change(ids, 'CONCLUIDA'), 2)
+        progress = self.percentages()
+        self.assertEqual([progress.get(pk) for pk in ids], [PROGRESS_BY_STATUS['CONCLUIDA']] * 2)
+        self.assertNotEqual(progress.get(self.tasks[2].pk), PROGRESS_BY_STATUS['CONCLUIDA'])
+        # Statuses without an entry keep the progress they had
+        self.change(ids[:1], 'EM_ANDAMENTO')
+        self.assertEqual(self.percentages()[ids[0]], PROGRESS_BY_STATUS['CONCLUIDA'])
+        self.change(ids, 'PENDENTE')
+        self.assertEqual([self.percentages()[pk] for pk in ids], [PROGRESS_BY_STATUS['PENDENTE']] * 2)
+        self.assertEqual(list(Task.objects.filter(pk__in=ids).values_list('status', flat=True)), ['PENDENTE'] * 2)
+
+    def test_tasks_of_other_users_are_ignored(self):
+        before = self.percentages().get(self.foreign.pk)
+        self.assertEqual(self.change([self.tasks[0].pk, self.foreign.pk], 'CONCLUIDA'), 1)
+        self.assertEqual(Task.objects.get(pk=self.foreign.pk).status, 'PENDENTE')
+        self.assertEqual(self.percentages().get(self.foreign.pk), before)
+        self.assertEqual(get_user_status_counts(self.other)['CONCLUIDA'], 0)
+        self.assertEqual(get_user_status_counts(self.user)['CONCLUIDA'], 1)
+
+    def test_dashboard_version_is_bumped(self):
+        version = get_dashboard_version(self.user.pk)
+        other_version = get_dashboard_version(self.other.pk)
+        self.change([self.tasks[0].pk], 'CONCLUIDA')
+        self.assertGreater(get_dashboard_version(self.user.pk), version)
+        self.assertEqual(get_dashboard_version(self.other.pk), other_version)
+        # Nothing changed: no bump
+        version = get_dashboard_version(self.user.pk)
+        self.assertEqual(self.change([self.foreign.pk], 'CONCLUIDA'), 0)
+        self.assertEqual(get_dashboard_version(self.user.pk), version)
+
+
+class CacheInvalidationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='cache', email='cache@mail.com', password='senha12345')
+
+    def test_dashboard_fragments_are_cached_until_a_change(self):
+        self.client.force_login(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            task = Task.objects.create(title='Original', user=self.user)
+        self.assertContains(self.client.get(reverse('index')), 'Original')
+        # Not through the model: no invalidation, the cached fragment is served
+        Task.objects.filter(pk=task.pk).update(title='Escondida')
+        self.assertContains(self.client.get(reverse('index')), 'Original')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            task.title = 'Editada'
+            task.save()
+            Category.objects.create(name='Trabalho', user=self.user)
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, 'Editada')
+        self.assertContains(response, 'Trabalho')
+
+    def test_other_users_fragments_are_kept(self):
+        other = User.objects.create_user(username='outro', email='outro@mail.com', password='senha12345')
+        version = get_dashboard_version(other.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            Task.objects.create(title='Minha', user=self.user)
+        self.assertEqual(get_dashboard_version(other.pk), version)
+
+    def test_dashboard_is_invalidated_when_the_write_commits(self):
+        version = get_dashboard_version(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            Task.objects.create(title='Nova', user=self.user)
+            self.assertEqual(get_dashboard_version(self.user.pk), version)
+        self.assertNotEqual(get_dashboard_version(self.user.pk), version)
+
+    @override_settings(REPOSITORY_CACHE_ENABLED=True)
+    def test_task_cached_before_the_commit_is_forgotten(self):
+        repository = CachedTaskRepository(Task)
+        task = Task.objects.create(title='Antes', user=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            task.title = 'Depois'
+            task.save()
+            # Another request, not seeing the uncommitted row yet, caches the old one
+            task_cache.get_or_load(task.pk, lambda: Task(pk=task.pk, title='Antes', user=self.user))
+        self.assertEqual(repository.getTaskById(task.pk).title, 'Depois')
+
+
+class SweepTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='sweep', email='sweep@mail.com', password='senha12345')
+        self.category = Category.objects.create(name='Casa', user=self.user)
+        self.today = date.today()
+
+    def create(self, title, days, **fields):
+        return Task.objects.create(title=title, user=self.user, category=self.category, date_expired=self.today + timedelta(days=days), **fields)
+
+    def test_expired_tasks_are_closed_chunk_by_chunk(self):
+        expired = [self.create(f'Vencida {days}', -days) for days in (1, 1, 2, 3, 5)]
+        expired.append(self.create('Em andamento', -1, status='EM_ANDAMENTO'))
+        done = self.create('Feita', -2, status='CONCLUIDA')
+        closed_before = self.create('Já fechada', -4, concluded=True)
+        future = self.create('Futura', 1)
+
+        result = TaskService().sweepSchedules(today=self.today, chunk_size=2)
+        self.assertEqual(result['concluded'], len(expired) + 1)
+        for task in expired:
+            task.refresh_from_db()
+            self.assertEqual((task.concluded, task.status), (True, 'CANCELADA'))
+        done.refresh_from_db()
+        self.assertEqual((done.concluded, done.status), (True, 'CONCLUIDA'))
+        future.refresh_from_db()
+        self.assertEqual((future.concluded, future.status), (False, 'PENDENTE'))
+        self.assertEqual(Task.objects.get(pk=closed_before.pk).date_update, closed_before.date_update)
+
+        # Counters moved set-based match the ones rebuilt from the tasks
+        self.assertEqual(get_user_status_counts(self.user), {'PENDENTE': 2, 'EM_ANDAMENTO': 0, 'CONCLUIDA': 1, 'CANCELADA': 6})
+        kept = sorted(CategoryTaskStat.objects.filter(category=self.category, count__gt=0).values_list('status', 'priority', 'count'))
+        rebuild_category_stats([self.category.pk])
+        self.assertEqual(kept, sorted(CategoryTaskStat.objects.filter(category=self.category, count__gt=0).values_list('status', 'priority', 'count')))
+        self.assertEqual(TaskService().sweepSchedules(today=self.today)['concluded'], 0)
+
+    def test_reminders_are_created_once_per_day(self):
+        due = [self.create(f'Vence amanhã {index}', 1) for index in range(3)]
+        self.create('Vence depois', 5)
+        self.create('Cancelada', 1, status='CANCELADA')
+        self.assertEqual(TaskService().sweepSchedules(today=self.today, chunk_size=1)['reminders'], 3)
+        self.assertEqual(TaskService().sweepSchedules(today=self.today, chunk_size=2)['reminders'], 0)
+        reminders = Notification.objects.filter(user=self.user, type='LEMBRETE')
+        self.assertEqual(sorted(reminders.values_list('task_id', flat=True)), [task.pk for task in due])
+
+    @override_settings(SYNC_TOMBSTONE_DAYS=30)
+    def test_old_tombstones_are_purged(self):
+        old = [Tombstone.objects.create(user=self.user, model='task', object_id=index) for index in range(3)]
+        recent = Tombstone.objects.create(user=self.user, model='task', object_id=10)
+        Tombstone.objects.filter(pk__in=[tombstone.pk for tombstone in old]).update(date_deleted=timezone.now() - timedelta(days=31))
+        self.assertEqual(TaskService().sweepSchedules(today=self.today, chunk_size=2)['tombstones'], 3)
+        self.assertEqual(list(Tombstone.objects.values_list('pk', flat=True)), [recent.pk])
+
+
+class ImportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='importa', email='importa@mail.com', password='senha12345')
+
+    def test_json_array_upload(self):
+        rows = [{"title": "Primeira", "category": "Casa"}, {"title": "Segunda", "priority": "ALTA"}, {"priority": "ALTA"}]
+        upload = SimpleUploadedFile('tarefas.json', json.dumps(rows).encode())
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('task_import'), {'file': upload})
+        self.assertEqual(response.context['result']['created'], 2)
+        self.assertEqual(response.context['result']['failed'], 1)
+        self.assertEqual(Task.objects.get(title='Primeira').category.name, 'Casa')
+
+    def test_json_array_is_read_element_by_element(self):
+        rows = [{"title": f"Tarefa {index}", "points": index * 1000} for index in range(200)] + [7]
+        text = json.dumps(rows)
+        read = []
+        def pieces(size):
+            for start in range(0, len(text), size):
+                read.append(start)
+                yield text[start:start + size]
+        parsed = iter_json_rows(pieces(5))
+        self.assertEqual(next(parsed), (1, rows[0]))
+        self.assertLess(len(read), 10)
+        self.assertEqual([row for number, row in parsed], rows[1:-1] + [None])
+        # Split anywhere, even inside a number
+        for size in (1, 3, 64 * 1024):
+            self.assertEqual([row for number, row in iter_json_rows(pieces(size))], rows[:-1] + [None])
+
+    def test_invalid_or_oversized_array_elements_stop_the_file(self):
+        self.assertEqual(list(iter_json_rows(io.StringIO('[{"title": "A"}, {"title":'))), [(1, {"title": "A"}), (2, None)])
+        self.assertEqual(list(iter_json_rows(io.StringIO('[{"title": "A"} {"title": "B"}]'))), [(1, {"title": "A"}), (2, None)])
+        with mock.patch('task.importer.MAX_JSON_ROW_SIZE', 20):
+            rows = list(iter_json_rows(io.StringIO('[{"title": "A"}, {"title": "' + 'x' * 100 + '"}]')))
+        self.assertEqual(rows, [(1, {"title": "A"}), (2, None)])
+
+    def test_failed_batch_leaves_no_categories(self):
+        rows = iter_rows(io.StringIO('{"title": "Tarefa", "category": "Nova"}\n'), 'jsonl')
+        with mock.patch.object(TaskService, 'bulkSync', side_effect=RuntimeError('falhou')):
+            with self.assertRaises(RuntimeError):
+                import_tasks(self.user, rows, TaskService())
+        self.assertFalse(Category.objects.filter(user=self.user, name='Nova').exists())
+
+
+class ReportTests(TestCase):
+    def test_generating_a_period_again_replaces_the_reports(self):
+        user = User.objects.create_user(username='relatorio', email='relatorio@mail.com', password='senha12345')
+        Task.objects.create(title='Feita', user=user, status='CONCLUIDA')
+        today = date.today()
+        generate_reports(today, today)
+        Task.objects.create(title='Aberta', user=user)
+        generate_reports(today, today)
+        report = Report.objects.get(user=user)
+        self.assertEqual((report.total_task, report.concluded_task), (2, 50))
+
+
+class TaskExportTests(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user(username='staff', email='staff@mail.com', password='senha12345', is_staff=True)
+        Task.objects.create(title='Exportada', user=self.staff)
+        self.client.force_login(self.staff)
+
+    def test_csv_export(self):
+        response = self.client.get(reverse('task_export', args=['tasks']))
+        content = b''.join(response.streaming_content).decode()
+        self.assertTrue(content.startswith('id,title,'))
+        self.assertIn('Exportada', content)
+
+    def test_invalid_user_parameter(self):
+        self.assertEqual(self.client.get(reverse('task_export', args=['tasks']), {'user': 'abc'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('task_export', args=['tasks']), {'user': '999999'}).status_code, 404)
+
+
+class AsyncViewsTests(TestCase):
+    """ The ASGI stack (settings.ASYNC_VIEWS): async views behind an all-async middleware chain """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.async_settings = override_settings(ASYNC_VIEWS=True)
+        cls.async_settings.enable()
+        reload_urlconfs()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.async_settings.disable()
+        reload_urlconfs()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='async', email='async@mail.com', password='senha12345')
+        self.other = User.objects.create_user(username='outro', email='outro@mail.com', password='senha12345')
+        self.client = AsyncClient()
+
+    @override_settings(REQUEST_METRICS_ENABLED=True, DEBUG=True) # adapters are only logged in DEBUG
+    def test_middleware_chain_needs_no_thread(self):
+        with self.assertLogs('django.request', 'DEBUG') as logs:
+            logging.getLogger('django.request').debug('load')
+            ASGIHandler().load_middleware(is_async=True)
+        self.assertFalse([line for line in logs.output if 'adapted' in line])
+
+    async def test_login_required(self):
+        response = await self.client.get(reverse('index'))
+        self.assertEqual(response.status_code, 302)
+
+    async def test_dashboard_and_conditional_get(self):
+        await self.client.aforce_login(self.user)
+        await Task.objects.acreate(title='Assíncrona', user=self.user)
+        await self.client.get(reverse('index')) # sets the CSRF cookie the page depends on
+        response = await self.client.get(reverse('index'))
+        self.assertContains(response, 'Assíncrona')
+        response = await self.client.get(reverse('index'), headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    async def test_create_update_and_delete(self):
+        await self.client.aforce_login(self.user)
+        data = {'title': 'Nova', 'priority': 'MEDIA', 'status': 'PENDENTE'}
+        response = await self.client.post(reverse('task'), data)
+        self.assertEqual(response.status_code, 302)
+        task = await Task.objects.aget(user=self.user, title='Nova')
+
+        response = await self.client.post(reverse('task_update', args=[task.pk]), {**data, 'status': 'CONCLUIDA'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual((await Progress.objects.aget(task=task)).percentage, 100)
+
+        self.assertContains(await self.client.get(reverse('task_delete', args=[task.pk])), 'Nova')
+        await self.client.post(reverse('task_delete', args=[task.pk]))
+        self.assertFalse(await Task.objects.filter(pk=task.pk).aexists())
+
+    async def test_tasks_of_other_users_are_not_found(self):
+        task = await Task.objects.acreate(title='Alheia', user=self.other)
+        await self.client.aforce_login(self.user)
+        self.assertEqual((await self.client.get(reverse('task_update', args=[task.pk]))).status_code, 404)
+        self.assertEqual((await self.client.get(reverse('task_delete', args=[task.pk]))).status_code, 404)
+        await self.client.post(reverse('task_delete', args=[task.pk]))
+        self.assertTrue(await Task.objects.filter(pk=task.pk).aexists())
+
+    async def test_progress_poll(self):
+        task = await Task.objects.acreate(title='Progresso', user=self.user, progress_points=40)
+        response = await self.client.get(reverse('progress', args=[task.pk]))
+        self.assertEqual(response.json(), {"data": 40})
+        response = await self.client.get(reverse('progress', args=[task.pk]), headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    async def test_export_streams_an_async_body(self):
+        await Task.objects.acreate(title='Exportada', user=self.user)
+        await self.client.aforce_login(self.user)
+        response = await self.client.get(reverse('task_export', args=['tasks']), {'gzip': '1'})
+        self.assertTrue(response.is_async)
+        content = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertIn(b'Exportada', gzip.decompress(content))
@@ -1,10 +1,31 @@
+from django.conf import settings
 from django.urls import path
-from .views import TaskCreateView, TaskUpdateView, TaskDeleteView, ProgressUpdateView, CompleteTaskDailyView
+from . import views
+
+# Under ASGI (TodoApp/asgi.py) the CRUD and polling views run on the async ORM
+if settings.ASYNC_VIEWS:
+    TaskCreateView, TaskUpdateView, TaskDeleteView, TaskExportView, ProgressUpdateView = (
+        views.AsyncTaskCreateView, views.AsyncTaskUpdateView, views.AsyncTaskDeleteView,
+        views.AsyncTaskExportView, views.AsyncProgressUpdateView,
+    )
+else:
+    TaskCreateView, TaskUpdateView, TaskDeleteView, TaskExportView, ProgressUpdateView = (
+        views.TaskCreateView, views.TaskUpdateView, views.TaskDeleteView,
+        views.TaskExportView, views.ProgressUpdateView,
+    )
 
 urlpatterns = [
     path('create/', TaskCreateView.as_view(), name='task'),
     path('<int:pk>/update', TaskUpdateView.as_view(), name='task_update'),
     path('<int:pk>/delete', TaskDeleteView.as_view(), name='task_delete'),
+    path('bulk-status/', views.TaskBulkStatusView.as_view(), name='task_bulk_status'),
+    path('search/', views.TaskSearchView.as_view(), name='task_search'),
+    path('import/', views.TaskImportView.as_view(), name='task_import'),
+    path('export/<str:dataset>/', TaskExportView.as_view(), name='task_export'),
     path('progress/<int:id>/', ProgressUpdateView.as_view(), name='progress'),
-    path('<int:task_id>/daily_complete/', CompleteTaskDailyView.as_view(), name='completar_diariamente'),
-]
\ No newline at end of file
+    path('<int:task_id>/daily_complete/', views.CompleteTaskDailyView.as_view(), name='completar_diariamente'),
+]
+
+# The event stream keeps its connection open: only served by the ASGI stack
+if settings.ASYNC_VIEWS:
+    urlpatterns.append(path('events/', views.EventStreamView.as_view(), name='task_events'))
@@ -1,4 +1,4 @@
-from django.core.mail import send_mail
+from core.mail import queue_mail
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 from django.conf import settings
@@ -27,11 +27,10 @@ def send_stage_completion_email(user, stage, course):
     })
     plain_message = strip_tags(html_message)
     
-    send_mail(
+    queue_mail(
         subject,
         plain_message,
         settings.DEFAULT_FROM_EMAIL,
         [user.email],
         html_message=html_message,
-        fail_silently=False,
     )
\ No newline at end of file
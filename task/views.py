@@ -2,17 +2,27 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators import csrf
-from django.http import JsonResponse
+from django.http import JsonResponse, Http404, StreamingHttpResponse
+from django.core.exceptions import BadRequest
+from django.utils.cache import get_conditional_response, patch_cache_control, quote_etag
+from django.utils.http import http_date
 # from django.contrib.auth.decorators import login_required
 from django.contrib.auth import get_user_model
 from django.db.utils import IntegrityError
 from rest_framework import serializers
 from django.contrib import messages
 from django.views import View
+from asgiref.sync import sync_to_async
 from .forms import TaskForm
-from .models import Task, DailyRegister
+from .models import Task, DailyRegister, STATUS_CHOICES
 from task.services import TaskService
+from task.importer import detect_format, iter_rows, import_tasks
+from task.exporter import DATASETS, FORMATS, export_rows, aexport_rows
+from core.db_router import replica_reads
+from core.mixins import AsyncLoginRequiredMixin
+from core.events import event_stream
 from datetime import date
+import codecs
 import json
 
 class TaskCreateView(LoginRequiredMixin, View):
@@ -55,14 +65,21 @@ class TaskUpdateView(LoginRequiredMixin, View):
     user = get_user_model()
     template_name = 'tasks/update_form.html'
     
+    def get_task(self, request, pk):
+        # Only the tasks of the logged user
+        task = self.model.getRepository().getUserTask(request.user, pk)
+        if task is None:
+            raise Http404("Task not found")
+        return task
+    
     # @login_required(login_url='login')
     def get(self, request, pk, *args, **kwargs):
-        form = self.form_class(initial=self.initial, instance=self.model.getRepository().getTaskById(id=pk))
+        form = self.form_class(initial=self.initial, instance=self.get_task(request, pk))
         return render(request, self.template_name, {"form":form})
     
     # @login_required(login_url='login')
     def post(self, request, pk, *args, **kwargs):
-        form = form = self.form_class(request.POST, instance=self.model.getRepository().getTaskById(id=pk))
+        form = self.form_class(request.POST, instance=self.get_task(request, pk))
         if form.is_valid():
             form.save()
             messages.success(request, "Task editado com sucesso!")
@@ -77,22 +94,224 @@ class TaskDeleteView(LoginRequiredMixin, View):
     template_name = 'tasks/delete_form.html'
     
     def get(self, request, pk, *args, **kwargs):
-        task = self.model.getRepository().getTaskById(id=pk)
+        task = self.model.getRepository().getUserTask(request.user, pk)
+        if task is None:
+            raise Http404("Task not found")
         return render(request, self.template_name, {"task":task})
     
     def post(self, request, pk, *args, **kwargs):
-        message = self.model.getRepository().deleteTaskById(id=pk)
-        if message: messages.info(request, message)
-        else: messages.error(request, "Error, Task with this id not exist!")
+        task = self.model.getRepository().getUserTask(request.user, pk)
+        if task is None:
+            messages.error(request, "Error, Task with this id not exist!")
+        else:
+            task.delete()
+            messages.info(request, "Task deleted with success!")
         return redirect("index")
     
+class AsyncTaskCreateView(AsyncLoginRequiredMixin, TaskCreateView):
+    """
+        TaskCreateView for ASGI. Form validation and rendering look up categories
+        synchronously, so they run in a thread; the insert uses the async ORM.
+    """
+    async def get(self, request, *args, **kwargs):
+        form = self.form_class(initial=self.initial)
+        return await sync_to_async(render)(request, self.template_name, {"form":form})
+    
+    async def post(self, request, *args, **kwargs):
+        form = self.form_class(request.POST)
+        if await sync_to_async(form.is_valid)():
+            await self.model.getRepository().acreate_task(
+                title=form.cleaned_data["title"],
+                description=form.cleaned_data["description"],
+                category=form.cleaned_data["category"],
+                date_expired=form.cleaned_data["date_expired"],
+                priority=form.cleaned_data["priority"],
+                status=form.cleaned_data["status"],
+                user=request.user
+            )
+            messages.success(request, "✨ Tarefa criada com sucesso!")
+            return redirect(request.GET.get('next', 'index'))
+        messages.warning(request, '❌ Tarefa não foi criada. Corrija os erros.')
+        return await sync_to_async(render)(request, self.template_name, {"form":form})
+    
+class AsyncTaskUpdateView(AsyncLoginRequiredMixin, TaskUpdateView):
+    """ TaskUpdateView for ASGI, limited to the tasks of the logged user """
+    async def get_task(self, request, pk):
+        task = await self.model.getRepository().agetUserTask(request.user, pk)
+        if task is None:
+            raise Http404("Task not found")
+        return task
+    
+    async def get(self, request, pk, *args, **kwargs):
+        form = self.form_class(initial=self.initial, instance=await self.get_task(request, pk))
+        return await sync_to_async(render)(request, self.template_name, {"form":form})
+    
+    async def post(self, request, pk, *args, **kwargs):
+        form = self.form_class(request.POST, instance=await self.get_task(request, pk))
+        if await sync_to_async(form.is_valid)():
+            await sync_to_async(form.save)()
+            messages.success(request, "Task editado com sucesso!")
+            return redirect("index")
+        messages.warning(request, "Falha ao atualizar a tarefa!")
+        return await sync_to_async(render)(request, self.template_name, {"form":form})
+    
+class AsyncTaskDeleteView(AsyncLoginRequiredMixin, TaskDeleteView):
+    """ TaskDeleteView for ASGI, limited to the tasks of the logged user """
+    async def get(self, request, pk, *args, **kwargs):
+        task = await self.model.getRepository().agetUserTask(request.user, pk)
+        if task is None:
+            raise Http404("Task not found")
+        return await sync_to_async(render)(request, self.template_name, {"task":task})
+    
+    async def post(self, request, pk, *args, **kwargs):
+        task = await self.model.getRepository().agetUserTask(request.user, pk)
+        if task is None:
+            messages.error(request, "Error, Task with this id not exist!")
+        else:
+            await task.adelete()
+            messages.info(request, "Task deleted with success!")
+        return redirect("index")
+    
+class TaskBulkStatusView(LoginRequiredMixin, View):
+    """
+        Multi-select action of the dashboard: move the checked tasks to one status at once
+    """
+    model = TaskService()
+    
+    def post(self, request, *args, **kwargs):
+        status = request.POST.get('status')
+        ids = [int(pk) for pk in request.POST.getlist('tasks') if pk.isdigit()]
+        if status not in dict(STATUS_CHOICES) or not ids:
+            messages.warning(request, "Selecione as tarefas e um status válido.")
+            return redirect("index")
+        total = self.model.changeStatus(request.user, ids, status)
+        messages.success(request, f"{total} tarefa(s) atualizada(s)!")
+        return redirect("index")
+    
+class TaskSearchView(LoginRequiredMixin, View):
+    """
+        Full-text search over title, description and category of the user's tasks
+    """
+    model = TaskService()
+    template_name = 'tasks/search.html'
+    paginate_by = 20
+    
+    @replica_reads()
+    def get(self, request, *args, **kwargs):
+        query = request.GET.get('q', '').strip()
+        page = request.GET.get('page', '1')
+        page = int(page) if page.isdigit() and int(page) > 0 else 1
+        tasks, has_next = [], False
+        if query:
+            tasks, has_next = self.model.getRepository().searchTasks(request.user, query, page=page, limit=self.paginate_by)
+        return render(request, self.template_name, {"query": query, "tasks": tasks, "page": page, "has_next": has_next})
+    
+class TaskImportView(LoginRequiredMixin, View):
+    """
+        Upload of a CSV, JSON lines or JSON array file with many tasks, imported in batches (see task.importer)
+    """
+    model = TaskService()
+    template_name = 'tasks/import_form.html'
+    
+    def get(self, request, *args, **kwargs):
+        return render(request, self.template_name)
+    
+    def post(self, request, *args, **kwargs):
+        upload = request.FILES.get('file')
+        if upload is None:
+            messages.warning(request, "Selecione um arquivo CSV, JSON ou JSON lines.")
+            return render(request, self.template_name)
+        # Large uploads are kept in a temporary file by Django: read it line by line
+        # (a JSON array may be a single line: read in chunks)
+        format = detect_format(upload.name)
+        lines = codecs.iterdecode(upload.chunks() if format == 'json' else upload, 'utf-8-sig')
+        try:
+            result = import_tasks(request.user, iter_rows(lines, format), self.model)
+        except UnicodeDecodeError:
+            messages.warning(request, "O arquivo deve estar em UTF-8.")
+            return render(request, self.template_name)
+        if result["created"]:
+            messages.success(request, f"✨ {result['created']} tarefa(s) importada(s)!")
+        if result["failed"]:
+            messages.warning(request, f"{result['failed']} linha(s) rejeitada(s).")
+        return render(request, self.template_name, {"result": result})
+    
+class TaskExportView(LoginRequiredMixin, View):
+    """
+        Download of the user's tasks, progress or daily registers: /task/export/<dataset>/?format=csv|ndjson&gzip=1
+        Staff users may export another account with ?user=<id>.
+    """
+    def get(self, request, dataset, *args, **kwargs):
+        user, format, compress = self.get_export(request, dataset)
+        return self.build_response(dataset, user, format, compress, export_rows(user, dataset, format, compress=compress))
+    
+    def get_export(self, request, dataset):
+        """ (user, format, compress) of the request; Http404/BadRequest when invalid """
+        format = request.GET.get('format', 'csv')
+        if dataset not in DATASETS or format not in FORMATS:
+            raise Http404("Export not found")
+        user = request.user
+        if request.GET.get('user') and request.user.is_staff:
+            if not request.GET['user'].isdigit():
+                raise BadRequest("Parâmetro user inválido.")
+            user = get_object_or_404(get_user_model(), pk=int(request.GET['user']))
+        return user, format, request.GET.get('gzip') == '1'
+    
+    def build_response(self, dataset, user, format, compress, content):
+        content_type, extension = FORMATS[format]
+        filename = f'{dataset}-{user.pk}.{extension}' + ('.gz' if compress else '')
+        response = StreamingHttpResponse(
+            content,
+            content_type='application/gzip' if compress else f'{content_type}; charset=utf-8',
+        )
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        patch_cache_control(response, private=True, no_store=True)
+        return response
+    
+class AsyncTaskExportView(AsyncLoginRequiredMixin, TaskExportView):
+    """ TaskExportView for ASGI: the body is an async iterator, sent piece by piece """
+    async def get(self, request, dataset, *args, **kwargs):
+        user, format, compress = await sync_to_async(self.get_export)(request, dataset)
+        return self.build_response(dataset, user, format, compress, aexport_rows(user, dataset, format, compress=compress))
+    
 class ProgressUpdateView(View):
     @csrf_exempt
     def get(self, request, id, *args, **kwargs):
-        task = Task.objects.get(id=id)
+        # Only the two columns needed for the answer and its validators
+        task = Task.objects.filter(id=id).values('progress_points', 'date_update').first()
         # task.update_progress_points()
-        print(task.progress_points)
-        return JsonResponse(data={"data":task.progress_points}, status=200)
+        return self.build_response(request, id, task)
+    
+    def build_response(self, request, id, task):
+        if task is None:
+            raise Http404("Task not found")
+        etag = quote_etag(f'{id}-{task["progress_points"]}-{task["date_update"].timestamp()}')
+        last_modified = int(task["date_update"].timestamp()) # HTTP dates have second precision
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return not_modified
+        response = JsonResponse(data={"data":task["progress_points"]}, status=200)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(response, no_cache=True)
+        return response
+
+class AsyncProgressUpdateView(ProgressUpdateView):
+    """ ProgressUpdateView for ASGI: polling requests only wait on the database, never hold a thread """
+    async def get(self, request, id, *args, **kwargs):
+        task = await Task.objects.filter(id=id).values('progress_points', 'date_update').afirst()
+        return self.build_response(request, id, task)
+
+class EventStreamView(AsyncLoginRequiredMixin, View):
+    """
+        Server-Sent Events of the user (task progress, new notifications), so open
+        dashboards are pushed changes instead of polling ProgressUpdateView. ASGI only.
+    """
+    async def get(self, request, *args, **kwargs):
+        response = StreamingHttpResponse(event_stream(request.user.pk), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no' # nginx: send each event as soon as it is written
+        return response
 
 class ProgressView(LoginRequiredMixin, View):
     def get(self, request, *args, **kwargs):
@@ -0,0 +1,14 @@
+"""
+    Entry points for the processes spawned by task.reports.
+    They are imported before Django is set up, so models are only imported inside the functions.
+"""
+import django
+
+
+def setup():
+    django.setup()
+
+
+def build_reports(user_ids, initial_period, end_period):
+    from .reports import build_reports
+    return build_reports(user_ids, initial_period, end_period)